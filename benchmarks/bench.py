@@ -0,0 +1,288 @@
+"""Data-layer micro-benchmarks, run against the source data scaled up by benchmarks/synthetic.py.
+
+    python benchmarks/bench.py --scale 10            # compare with baselines/x10.json
+    python benchmarks/bench.py --scale 10 --update   # record a new baseline
+
+Each case runs on a fresh data generation, so nothing cached by an earlier repetition is
+reused. Time is the best of ``--repeat`` runs; peak memory is the Python-heap peak of one
+extra run under tracemalloc (pyarrow's own buffers are not counted). The run fails with
+exit status 1 when a case's throughput or peak memory regresses past the tolerances.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tracemalloc
+from typing import Callable, NamedTuple
+
+BENCH_FOLDER = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_FOLDER)
+BASELINE_FOLDER = os.path.join(BENCH_FOLDER, 'baselines')
+DATASET_FOLDER = os.path.join(BENCH_FOLDER, '.data')
+
+sys.path.append(ROOT)
+
+from synthetic import generate
+
+# Regressions smaller than this many seconds are timer noise, whatever the ratio
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+class Case(NamedTuple):
+    """One benchmark: ``run`` returns the number of rows it processed; ``setup`` is not timed."""
+    name: str
+    run: Callable
+    setup: Callable = None
+
+
+def cases():
+    """The benchmark cases; imported late so utils picks up the DATA_FOLDER set by main."""
+    import pandas as pd
+    import streamlit.config
+    import streamlit.logger
+    from utils import (TABLES, LIST_COLUMNS, CACHE_FOLDER, FilterSpec, load_data, process_data, load_table,
+                       load_tables, shared_bridge, sidebar_filters, filter_table, safe_parse)
+    from engine import query_engine
+    from cube import load_medal_cube
+    from schedule import load_schedule, schedule_days, schedule_view, load_session_index, venue_utilization
+    from search import load_athlete_search_index
+    from warmup import warm_up
+    from distributions import box_stats, box_figure
+
+    # sidebar_filters runs outside a script run, and Streamlit warns about that on every widget.
+    # Reading an option parses the config first, which would reset the level.
+    streamlit.config.get_option('logger.level')
+    streamlit.logger.set_log_level('error')
+
+    specs = [
+        FilterSpec(),
+        FilterSpec(continents=('Europe',)),
+        FilterSpec(countries=('France', 'United States', 'Japan'), sports=('Athletics', 'Swimming'),
+                   medal_types=('Gold',)),
+    ]
+
+    def read_all():
+        data = load_data()
+        return sum(len(data[name]) for name in TABLES)
+
+    def read_all_concurrently():
+        tables = load_tables(dict.fromkeys(TABLES))
+        return sum(len(df) for df in tables.values())
+
+    def drop_cache():
+        shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+    def process():
+        data = process_data(load_data(columns={'nocs': ['code', 'country']}))
+        return len(data['nocs'])
+
+    def parse_lists():
+        rows = 0
+        for name, columns in LIST_COLUMNS.items():
+            df = load_table(name, tuple(columns))
+            for column in columns:
+                rows += len(df[column].astype(object).map(safe_parse))
+        return rows
+
+    def build_bridges():
+        rows = 0
+        for name, columns in LIST_COLUMNS.items():
+            for column in columns:
+                rows += len(shared_bridge(name, column))
+        return rows
+
+    def sidebar_options():
+        data = process_data(load_data(columns={'events': ['sport'], 'nocs': ['country']}))
+        sidebar_filters(data)
+        return len(data['nocs']) + len(data['events'])
+
+    def build_cube():
+        load_medal_cube()
+        return len(load_table('medals', ('country_code',)))
+
+    def overview_page():
+        engine = query_engine()
+        rows = 0
+        for spec in specs:
+            for name in ('athletes', 'nocs', 'events'):
+                rows += len(filter_table(load_table(name, ('country', 'sport')), name, spec))
+            engine.medal_total(spec, ('country', 'medal_type'))
+            engine.medal_counts(spec, ('medal_type',), ('country', 'medal_type'))
+            engine.top_countries(spec, 10, ('country', 'medal_type'))
+        return rows
+
+    def global_analysis_page():
+        engine = query_engine()
+        rows = 0
+        for spec in specs:
+            rows += len(engine.country_medal_totals(spec))
+            rows += len(engine.medal_counts(spec, ('Continent', 'country', 'discipline')))
+            rows += len(engine.medal_counts(spec, ('Continent', 'medal_type'), ('country', 'medal_type')))
+            top_20 = engine.top_countries(spec, 20, ('country', 'medal_type'))['country']
+            by_type = engine.medal_counts(spec, ('country', 'medal_type'), ('country', 'medal_type'))
+            rows += len(by_type[by_type['country'].isin(top_20)])
+        return rows
+
+    def athlete_performance_page():
+        athletes = load_table('athletes', ('code', 'name', 'country', 'disciplines', 'gender', 'birth_date'))
+        medals = load_table('medals', ('code', 'name', 'country', 'discipline'))
+        nocs = load_table('nocs', ('country',), processed=True)
+        search_index = load_athlete_search_index()
+        rows = 0
+        for spec in specs:
+            filtered = filter_table(athletes, 'athletes', spec, ('country', 'sport'))
+            filtered['sport'] = filtered['disciplines'].astype(str).str.replace(r"[\[\]']", "", regex=True)
+            filtered['age'] = 2024 - filtered['birth_date'].dt.year
+            box_figure(box_stats(filtered, 'age', ['sport', 'gender']), x='sport', color='gender', value='age')
+            with_continent = pd.merge(filtered, nocs[['country', 'Continent']], on='country', how='left')
+            with_continent['gender'].value_counts()
+            filtered_medals = filter_table(medals, 'medals', spec, ('country', 'sport'))
+            filtered_medals['code'].value_counts().head(10)
+            search_index.search('marchand', k=10, allowed=filtered.index)
+            rows += len(filtered) + len(filtered_medals)
+        return rows
+
+    def sports_events_page():
+        engine = query_engine()
+        first_day, last_day = schedule_days()
+        session_index, _ = load_session_index()
+        moment = pd.Timestamp(first_day).tz_localize('Europe/Paris') + pd.Timedelta(hours=12)
+        for spec in specs:
+            schedule_view(spec, first_day, last_day, 'discipline')
+            schedule_view(spec, first_day, first_day, 'venue')
+            session_index.at(moment)
+            venue_utilization(first_day, last_day)
+            engine.medal_counts(spec, ('discipline',), ('country',))
+        return len(load_schedule()) * len(specs)
+
+    return [
+        Case('load_data/csv', read_all, drop_cache),
+        Case('load_data/parquet', read_all),
+        Case('load_tables/csv', read_all_concurrently, drop_cache),
+        Case('load_tables/parquet', read_all_concurrently),
+        Case('process_data', process),
+        Case('safe_parse', parse_lists, lambda: [load_table(name) for name in LIST_COLUMNS]),
+        Case('list_bridges', build_bridges, lambda: [load_table(name) for name in LIST_COLUMNS]),
+        Case('sidebar_filters/options', sidebar_options),
+        Case('medal_cube/build', build_cube, lambda: load_table('medals')),
+        Case('page/overview', overview_page, warm_up),
+        Case('page/global_analysis', global_analysis_page, warm_up),
+        Case('page/athlete_performance', athlete_performance_page, warm_up),
+        Case('page/sports_events', sports_events_page, warm_up),
+    ]
+
+
+def fresh_generation():
+    from utils import Generation, data_version, publish_generation
+    publish_generation(Generation(data_version()))
+    gc.collect()
+
+
+def measure(case, repeat):
+    """Best and median seconds over ``repeat`` runs, rows processed and peak traced memory."""
+    times = []
+    for _ in range(repeat):
+        fresh_generation()
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        rows = case.run()
+        times.append(time.perf_counter() - start)
+
+    fresh_generation()
+    if case.setup:
+        case.setup()
+    tracemalloc.start()
+    case.run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'seconds': round(best, 5),
+        'median_seconds': round(sorted(times)[len(times) // 2], 5),
+        'rows': rows,
+        'rows_per_second': round(rows / best, 1) if best > 0 else None,
+        'peak_mb': round(peak / 2 ** 20, 2),
+    }
+
+
+def regressions(results, baseline, time_tolerance, memory_tolerance):
+    """Messages for every case slower or heavier than its baseline beyond the tolerances."""
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if (result['seconds'] - base['seconds'] > MIN_TIME_DELTA
+                and result['rows_per_second'] < base['rows_per_second'] * (1 - time_tolerance)):
+            found.append(f"{name}: throughput {result['rows_per_second']:,.0f} rows/s, "
+                         f"baseline {base['rows_per_second']:,.0f} rows/s")
+        if (result['peak_mb'] - base['peak_mb'] > MIN_MEMORY_DELTA_MB
+                and result['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance)):
+            found.append(f"{name}: peak memory {result['peak_mb']:.1f} MB, baseline {base['peak_mb']:.1f} MB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data-layer benchmarks at a synthetic scale.")
+    parser.add_argument('--scale', type=int, default=1, help="copies of the source data (1, 10, 100, 1000)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='*', help="run only the cases whose name starts with one of these")
+    parser.add_argument('--update', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--time-tolerance', type=float, default=0.3, help="allowed throughput drop, as a fraction")
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help="allowed peak memory growth")
+    args = parser.parse_args()
+
+    folder = generate(args.scale, os.path.join(DATASET_FOLDER, f'x{args.scale}'), os.path.join(ROOT, 'data'))
+    # utils reads these at import: benchmark the synthetic data, derived in-process
+    os.environ['DATA_FOLDER'] = folder
+    os.environ['ARTIFACT_FOLDER'] = ''
+
+    import pandas as pd
+    import numpy as np
+    results = {}
+    for case in cases():
+        if args.only and not any(case.name.startswith(prefix) for prefix in args.only):
+            continue
+        results[case.name] = measure(case, args.repeat)
+        r = results[case.name]
+        print(f"{case.name:28} {r['seconds'] * 1000:10.1f} ms {r['rows_per_second'] or 0:14,.0f} rows/s "
+              f"{r['peak_mb']:9.1f} MB")
+
+    baseline_path = os.path.join(BASELINE_FOLDER, f'x{args.scale}.json')
+    if args.update:
+        report = {
+            'scale': args.scale,
+            'environment': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                            'machine': platform.machine()},
+            'cases': results,
+        }
+        if args.only and os.path.exists(baseline_path):
+            with open(baseline_path) as f:
+                report['cases'] = {**json.load(f)['cases'], **results}
+        os.makedirs(BASELINE_FOLDER, exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; record one with --update")
+        return 0
+    with open(baseline_path) as f:
+        baseline = json.load(f)['cases']
+    found = regressions(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for message in found:
+        print(f"REGRESSION {message}")
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Multi-session load test of the dashboard pages.
+
+    python benchmarks/loadtest.py --sessions 20 --reruns 10
+    python benchmarks/loadtest.py --sessions 50 --pages main.py --output loadtest.json
+
+Each simulated session opens one page with Streamlit's AppTest, then reruns it with
+random sidebar_filters selections. Sessions run on threads in this process, so, as with one
+``streamlit run`` server, they share the process-wide caches and the GIL. Reported per page:
+rerun latency percentiles, plus process CPU time and resident memory over the whole test.
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import threading
+import contextlib
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Optional, not in requirements.txt: only the sampled RSS and CPU figures need it
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['main.py'] + sorted(os.path.join('pages', f) for f in os.listdir(os.path.join(ROOT, 'pages'))
+                             if f.endswith('.py'))
+PERCENTILES = (50, 90, 95, 99)
+SAMPLE_INTERVAL = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+def sidebar_widget(app, kind, label):
+    for widget in getattr(app.sidebar, kind):
+        if widget.label == label:
+            return widget
+    return None
+
+
+def randomize_filters(app, rng):
+    """Sets a random sidebar selection, the way one visitor changes one or two filters at a time."""
+    continent = sidebar_widget(app, 'multiselect', "Select Continent")
+    country = sidebar_widget(app, 'multiselect', "Select Country (NOC)")
+    sport = sidebar_widget(app, 'multiselect', "Select Sport")
+    # Country options depend on the continents, so the two are never changed in the same rerun
+    choice = rng.choice(['clear', 'continent', 'country', 'sport', 'sport', 'medal'])
+    if choice == 'clear':
+        for widget in (continent, country, sport):
+            if widget is not None:
+                widget.set_value([])
+    elif choice == 'continent' and continent is not None:
+        if country is not None:
+            country.set_value([])
+        continent.set_value(rng.sample(continent.options, rng.randint(1, min(2, len(continent.options)))))
+    elif choice == 'country' and country is not None and country.options:
+        country.set_value(rng.sample(country.options, rng.randint(1, min(5, len(country.options)))))
+    elif choice in ('sport', 'country') and sport is not None:
+        sport.set_value(rng.sample(sport.options, rng.randint(1, min(3, len(sport.options)))))
+    elif app.sidebar.checkbox:
+        medal = rng.choice(list(app.sidebar.checkbox))
+        medal.set_value(not medal.value)
+
+
+def simulate_session(page, reruns, seed, timeout, think_time):
+    """One visitor on ``page``: the first run and ``reruns`` filter changes; returns their latencies."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=timeout)
+    first, latencies, errors = None, [], 0
+    for rerun in range(reruns + 1):
+        try:
+            if rerun:
+                if think_time:
+                    time.sleep(rng.uniform(0, think_time))
+                randomize_filters(app, rng)
+            start = time.perf_counter()
+            app.run()
+        except Exception:
+            # A run that times out or leaves the widget tree unusable ends the session
+            logger.exception("Session %d on %s failed", seed, page)
+            return page, first, latencies, errors + 1
+        if rerun:
+            latencies.append(time.perf_counter() - start)
+        else:
+            first = time.perf_counter() - start
+        errors += len(app.exception)
+    return page, first, latencies, errors
+
+
+@contextlib.contextmanager
+def shared_runtime(pages):
+    """Lets AppTest sessions of ``pages`` run concurrently; yields the exceptions raised on script threads.
+
+    Each AppTest run installs its own mock Runtime and removes it when it ends, which would
+    leave the sessions still running without one. While the test runs, a shared mock stands
+    in whenever no run has one installed.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    fallback = mock.MagicMock(spec=Runtime)
+    fallback.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    fallback.cache_storage_manager = MemoryCacheStorageManager()
+    thread_errors = []
+    previous_hook = threading.excepthook
+
+    def count_error(args):
+        thread_errors.append(args.exc_type.__name__)
+        previous_hook(args)
+
+    # One script cache, as in the server, filled before the sessions start: each run would
+    # otherwise compile its page again, and concurrent compiles are not thread-safe before Python 3.12
+    script_cache = ScriptCache()
+    for page in pages:
+        script_cache.get_bytecode(os.path.join(ROOT, page))
+
+    threading.excepthook = count_error
+    try:
+        with mock.patch.object(Runtime, 'instance', classmethod(lambda cls: cls._instance or fallback)), \
+                mock.patch.object(Runtime, 'exists', classmethod(lambda cls: True)), \
+                mock.patch('streamlit.testing.v1.app_test.ScriptCache', lambda: script_cache), \
+                mock.patch('streamlit.testing.v1.local_script_runner.ScriptCache', lambda: script_cache):
+            yield thread_errors
+    finally:
+        threading.excepthook = previous_hook
+
+
+class ResourceSampler(threading.Thread):
+    """Samples the process RSS and CPU utilisation while the test runs (needs psutil)."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.rss = []
+        self.cpu = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        process = psutil.Process()
+        process.cpu_percent()
+        while not self.stopped.wait(self.interval):
+            self.rss.append(process.memory_info().rss)
+            self.cpu.append(process.cpu_percent())
+
+
+def summarize(values):
+    """Latency percentiles in milliseconds."""
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000
+    summary = {f'p{p}': round(float(np.percentile(values, p)), 1) for p in PERCENTILES}
+    summary.update(mean=round(float(values.mean()), 1), max=round(float(values.max()), 1), count=len(values))
+    return summary
+
+
+def load_test(pages, sessions, reruns, workers, seed, timeout, think_time):
+    """Runs ``sessions`` simulated visitors spread over ``pages``, at most ``workers`` at a time."""
+    sampler = ResourceSampler() if PSUTIL_AVAILABLE else None
+    if sampler:
+        sampler.start()
+    cpu_start, wall_start = os.times(), time.perf_counter()
+
+    plan = [(pages[i % len(pages)], reruns, seed + i, timeout, think_time) for i in range(sessions)]
+    with shared_runtime(pages) as thread_errors, ThreadPoolExecutor(workers or sessions) as pool:
+        outcomes = list(pool.map(lambda args: simulate_session(*args), plan))
+
+    wall = time.perf_counter() - wall_start
+    cpu_end = os.times()
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    if sampler:
+        sampler.stopped.set()
+        sampler.join()
+
+    report = {'sessions': sessions, 'reruns_per_session': reruns, 'wall_seconds': round(wall, 2),
+              'cpu_seconds': round(cpu, 2), 'cpu_utilization': round(cpu / wall, 2) if wall else None,
+              # ru_maxrss is in kilobytes on Linux, bytes on macOS
+              'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                                   / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1),
+              'thread_errors': len(thread_errors), 'pages': {}}
+    if sampler and sampler.rss:
+        report['rss_mb'] = {'mean': round(float(np.mean(sampler.rss)) / 2 ** 20, 1),
+                            'max': round(max(sampler.rss) / 2 ** 20, 1)}
+        report['cpu_percent'] = {'mean': round(float(np.mean(sampler.cpu)), 1), 'max': max(sampler.cpu)}
+
+    for page in pages:
+        mine = [o for o in outcomes if o[0] == page]
+        report['pages'][page] = {
+            'first_run_ms': summarize([o[1] for o in mine if o[1] is not None]),
+            'rerun_ms': summarize([latency for o in mine for latency in o[2]]),
+            'errors': sum(o[3] for o in mine),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['sessions']} sessions x {report['reruns_per_session']} reruns in {report['wall_seconds']}s, "
+          f"CPU {report['cpu_seconds']}s ({report['cpu_utilization']} cores), peak RSS {report['peak_rss_mb']} MB")
+    if report['thread_errors']:
+        print(f"{report['thread_errors']} exceptions escaped the script threads")
+    if 'rss_mb' in report:
+        print(f"RSS mean {report['rss_mb']['mean']} MB, CPU mean {report['cpu_percent']['mean']}%")
+    header = ' '.join(f'{"p" + str(p):>8}' for p in PERCENTILES)
+    print(f"{'page':40} {'reruns':>6} {header} {'max':>8} {'errors':>6}")
+    for page, stats in report['pages'].items():
+        rerun = stats['rerun_ms']
+        values = ' '.join(f"{rerun.get('p' + str(p), 0):8.1f}" for p in PERCENTILES)
+        print(f"{page:40} {rerun.get('count', 0):6} {values} {rerun.get('max', 0):8.1f} {stats['errors']:6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the dashboard pages.")
+    parser.add_argument('--sessions', type=int, default=20, help="simulated visitors, spread over the pages")
+    parser.add_argument('--reruns', type=int, default=10, help="filter changes per visitor")
+    parser.add_argument('--workers', type=int, default=None, help="visitors active at once (default: all)")
+    parser.add_argument('--pages', nargs='*', default=PAGES, help="page scripts, relative to the repository")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120, help="seconds one run may take")
+    parser.add_argument('--think-time', type=float, default=0.0, help="max random pause between reruns, seconds")
+    parser.add_argument('--output', help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    # Pages resolve data/ relative to the working directory, as under `streamlit run`
+    os.chdir(ROOT)
+    # Deprecation warnings would repeat on every rerun of every session. Reading an option
+    # parses the config first, which would reset the level.
+    import streamlit.config
+    import streamlit.logger
+    streamlit.config.get_option('logger.level')
+    streamlit.logger.set_log_level('error')
+    report = load_test(args.pages, args.sessions, args.reruns, args.workers, args.seed, args.timeout,
+                       args.think_time)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    failed = report['thread_errors'] or any(stats['errors'] for stats in report['pages'].values())
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Synthetic scale-up of the Paris 2024 tables for the benchmarks.
+
+``generate(scale, folder)`` writes every source CSV ``scale`` times over. Replica 0 is the
+original data; each further replica is a copy with its own NOCs, athletes, coaches, officials
+and teams, so the entity vocabularies, medals and sessions all grow with the scale while
+the schema, the sports and the calendar stay the same. Replica NOC names are not real
+countries, so they resolve to the 'Unknown' continent.
+"""
+import os
+import re
+import argparse
+
+import pandas as pd
+
+SOURCE_FOLDER = 'data'
+# Bump whenever the generated data changes, so cached datasets are regenerated
+GENERATOR_VERSION = 1
+MARKER_FILE = '.complete'
+
+# Integer keys of replicas are CODE_BASE + replica * family size + rank, which keeps
+# them unique and within the int32 columns of the schema up to a scale of several thousand
+CODE_BASE = 1_000_000_000
+
+# Table -> column -> how it changes from one replica to the next. Tables not listed
+# (events, venues, torch_route) are the same in every replica and written once.
+# schedules and schedules_preliminary are repeated as they are: more sessions at the same times.
+REPLICATED = {
+    'athletes': {'code': 'athlete', 'name': 'name', 'country_code': 'noc', 'country': 'country',
+                 'country_long': 'country'},
+    'coaches': {'code': 'coach', 'name': 'name', 'country_code': 'noc', 'country': 'country',
+                'country_long': 'country'},
+    'technical_officials': {'code': 'official', 'name': 'name'},
+    'medallists': {'code_athlete': 'athlete', 'code_team': 'team', 'name': 'name', 'country_code': 'noc',
+                   'country': 'country', 'country_long': 'country', 'nationality_code': 'noc',
+                   'nationality': 'country', 'nationality_long': 'country'},
+    'medals': {'code': 'athlete_or_team', 'name': 'name', 'country_code': 'noc', 'country': 'country',
+               'country_long': 'country'},
+    'medals_total': {'country_code': 'noc', 'country': 'country', 'country_long': 'country'},
+    'nocs': {'code': 'noc', 'country': 'country', 'country_long': 'country'},
+    'teams': {'code': 'team', 'country_code': 'noc', 'country': 'country', 'country_long': 'country',
+              'athletes_codes': 'athlete_list', 'coaches_codes': 'coach_list'},
+    'schedules': {},
+    'schedules_preliminary': {},
+}
+
+# Integer key family -> (table, column) pairs holding its keys
+FAMILIES = {
+    'athlete': [('athletes', 'code'), ('medallists', 'code_athlete'), ('medals', 'code'), ('teams', 'athletes_codes')],
+    'coach': [('coaches', 'code'), ('teams', 'coaches_codes')],
+    'official': [('technical_officials', 'code')],
+}
+
+DIGITS = re.compile(r'\d+')
+
+
+def read_source(name, folder=SOURCE_FOLDER):
+    """A source table as raw text, so untouched cells are written back exactly as read."""
+    return pd.read_csv(os.path.join(folder, name + '.csv'), dtype=str, keep_default_na=False)
+
+
+def family_codes(tables):
+    """Sorted integer keys of each family in FAMILIES, over every table referencing it."""
+    families = {}
+    for family, sources in FAMILIES.items():
+        values = []
+        for name, column in sources:
+            if name in tables and column in tables[name].columns:
+                items = tables[name][column].str.findall(DIGITS).explode().dropna()
+                values.append(pd.to_numeric(items, errors='coerce').dropna().astype('int64'))
+        families[family] = pd.Index(pd.unique(pd.concat(values))).sort_values() if values else pd.Index([])
+    return families
+
+
+def remap_codes(values, codes, replica):
+    """``values`` with every key found in ``codes`` moved to the key range of ``replica``."""
+    positions = codes.get_indexer(pd.to_numeric(values, errors='coerce'))
+    moved = pd.Series(CODE_BASE + replica * len(codes) + positions, index=values.index).astype(str)
+    return values.where(positions < 0, moved)
+
+
+def remap_lists(values, codes, replica):
+    """Remaps the keys inside list literals such as "['1913366', '1913367']"."""
+    mapping = {str(code): str(CODE_BASE + replica * len(codes) + i) for i, code in enumerate(codes)}
+    return values.str.replace(DIGITS, lambda m: mapping.get(m.group(0), m.group(0)), regex=True)
+
+
+def replicate(df, columns, families, replica):
+    """Replica ``replica`` of a table whose ``columns`` change as described in REPLICATED."""
+    if replica == 0:
+        return df
+    df = df.copy()
+    for column, kind in columns.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        present = values != ''
+        if kind == 'noc':
+            changed = values + str(replica)
+        elif kind in ('country', 'name'):
+            changed = values + f' {replica}'
+        elif kind == 'team':
+            changed = values + f'-{replica}'
+        elif kind in ('athlete', 'coach', 'official'):
+            changed = remap_codes(values, families[kind], replica)
+        elif kind == 'athlete_or_team':
+            changed = remap_codes(values, families['athlete'], replica)
+            changed = changed.where(changed != values, values + f'-{replica}')
+        else:
+            changed = remap_lists(values, families[kind.replace('_list', '')], replica)
+        df[column] = values.where(~present, changed)
+    return df
+
+
+def generate(scale, folder, source=SOURCE_FOLDER):
+    """Writes the source tables scaled ``scale`` times into ``folder``, unless already there.
+
+    Each table is streamed out one replica at a time, so memory stays at one copy of the source.
+    """
+    marker = os.path.join(folder, MARKER_FILE)
+    stamp = f'{GENERATOR_VERSION} {scale}'
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if f.read() == stamp:
+                return folder
+    os.makedirs(folder, exist_ok=True)
+
+    names = [os.path.splitext(f)[0] for f in sorted(os.listdir(source)) if f.endswith('.csv')]
+    tables = {name: read_source(name, source) for name in names}
+    families = family_codes(tables)
+    for name, df in tables.items():
+        replicas = range(scale) if name in REPLICATED else range(1)
+        with open(os.path.join(folder, name + '.csv'), 'w', newline='') as f:
+            for replica in replicas:
+                replicate(df, REPLICATED.get(name, {}), families, replica).to_csv(f, header=replica == 0,
+                                                                                  index=False)
+    with open(marker, 'w') as f:
+        f.write(stamp)
+    return folder
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write the Paris 2024 tables scaled up N times.")
+    parser.add_argument('scale', type=int)
+    parser.add_argument('folder')
+    args = parser.parse_args()
+    generate(args.scale, args.folder)
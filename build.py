@@ -0,0 +1,160 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import utils
+from utils import (DATA_FOLDER, TABLES, LIST_COLUMNS, ENTITIES, ARTIFACT_FOLDER, ARTIFACT_FORMAT, PARQUET_AVAILABLE,
+                   load_manifest, save_manifest, read_csv_cached, source_hashes, artifact_version, shared_table,
+                   shared_bridge, complete_vocabulary, load_noc_dimension)
+from cube import load_medal_cube
+from schedule import SESSION_SOURCES, load_schedule, load_session_index
+
+logger = logging.getLogger(__name__)
+
+
+def write_parquet(path, df):
+    if df is None or df.empty:
+        return False
+    df.to_parquet(path, index=False)
+    return True
+
+
+def write_table(path, name):
+    return write_parquet(path, shared_table(name))
+
+
+def write_bridge(path, name, column):
+    return write_parquet(path, shared_bridge(name, column))
+
+
+def write_vocabulary(path, entity):
+    # Sorted, so the ids don't depend on the order this worker loaded the tables in
+    return write_parquet(path, pd.DataFrame({'key': complete_vocabulary(entity).sort_values()}))
+
+
+def write_noc_dimension(path):
+    return write_parquet(path, load_noc_dimension())
+
+
+def write_medal_cube(path):
+    cube = load_medal_cube()
+    if cube is None:
+        return False
+    cube.save(path)
+    return True
+
+
+def write_schedule(path):
+    return write_parquet(path, load_schedule())
+
+
+def write_sessions(path, name):
+    index, _ = load_session_index(name)
+    return index is not None and write_parquet(path, index.sessions.assign(row=index.rows))
+
+
+WRITERS = {
+    'table': write_table, 'bridge': write_bridge, 'vocabulary': write_vocabulary,
+    'noc_dimension': write_noc_dimension, 'medal_cube': write_medal_cube,
+    'schedule': write_schedule, 'sessions': write_sessions,
+}
+
+
+def artifact_tasks():
+    """``(relative path, writer, args)`` of every artifact the loaders read (see utils.artifact_path)."""
+    tasks = [('medal_cube.npz', 'medal_cube', ()), ('schedule.parquet', 'schedule', ()),
+             ('noc_dimension.parquet', 'noc_dimension', ())]
+    tasks += [(os.path.join('sessions', f'{name}.parquet'), 'sessions', (name,)) for name in SESSION_SOURCES]
+    tasks += [(os.path.join('tables', f'{name}.parquet'), 'table', (name,)) for name in TABLES]
+    tasks += [(os.path.join('bridges', f'{name}.{column}.parquet'), 'bridge', (name, column))
+              for name, columns in LIST_COLUMNS.items() for column in columns]
+    tasks += [(os.path.join('vocabularies', f'{entity}.parquet'), 'vocabulary', (entity,)) for entity in ENTITIES]
+    return tasks
+
+
+def disable_artifacts():
+    """Worker initializer: derive everything from the sources, never from an earlier build."""
+    utils.ARTIFACT_FOLDER = ''
+
+
+def convert_source(file):
+    """Converts one CSV into the typed Parquet cache; returns its manifest entry. Runs in a worker."""
+    manifest = load_manifest()
+    read_csv_cached(file, manifest, ())
+    return manifest.get(file)
+
+
+def build_artifact(folder, relative, writer, args):
+    """Writes one artifact under ``folder``; returns ``(relative, seconds, written)``. Runs in a worker."""
+    start = time.perf_counter()
+    path = os.path.join(folder, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = WRITERS[writer](path, *args)
+    return relative, time.perf_counter() - start, written
+
+
+def build(jobs=None, force=False):
+    """Builds every derived artifact for the data on disk into ``ARTIFACT_FOLDER/<version>``.
+
+    The CSVs are first converted to the Parquet cache, one file per worker, so the workers
+    that then build the tables, bridges, vocabularies, NOC dimension, medal cube and schedule
+    all read typed columns. The build is written to a staging folder and renamed into place,
+    so the app never sees a partial build. Returns the folder.
+    """
+    if not PARQUET_AVAILABLE:
+        raise SystemExit("Building artifacts needs pyarrow")
+    if not ARTIFACT_FOLDER:
+        raise SystemExit("ARTIFACT_FOLDER is empty; set it to where the artifacts should go")
+    hashes = source_hashes()
+    version = artifact_version(hashes)
+    folder = os.path.join(ARTIFACT_FOLDER, version)
+    if os.path.isdir(folder) and not force:
+        logger.info("Artifacts %s are up to date", folder)
+        return folder
+
+    staging = f"{folder}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    start = time.perf_counter()
+    timings = {}
+    with ProcessPoolExecutor(jobs, initializer=disable_artifacts) as pool:
+        files = [file for file in TABLES.values() if os.path.exists(os.path.join(DATA_FOLDER, file))]
+        manifest = load_manifest()
+        for file, entry in zip(files, pool.map(convert_source, files)):
+            if entry:
+                manifest[file] = entry
+        save_manifest(manifest)
+        logger.info("Converted %d sources in %.2fs", len(files), time.perf_counter() - start)
+
+        futures = [pool.submit(build_artifact, staging, *task) for task in artifact_tasks()]
+        for future in as_completed(futures):
+            relative, seconds, written = future.result()
+            if written:
+                timings[relative] = round(seconds, 3)
+            logger.info("%-45s %6.2fs%s", relative, seconds, '' if written else ' (no data, skipped)')
+
+    if artifact_version(source_hashes()) != version:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise SystemExit("data/ changed during the build; run it again")
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump({'version': version, 'format': ARTIFACT_FORMAT, 'sources': hashes, 'artifacts': timings},
+                  f, indent=2, sort_keys=True)
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(staging, folder)
+    logger.info("Built %d artifacts into %s in %.2fs", len(timings), folder, time.perf_counter() - start)
+    return folder
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build every derived artifact the dashboard pages read.")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the artifacts are up to date")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    build(args.jobs, args.force)
@@ -0,0 +1,159 @@
+import pandas as pd
+import numpy as np
+
+from utils import (generation_cache, current_generation, load_table, load_noc_dimension, table_update,
+                   table_changes, effective_countries, artifact_path, MEDAL_COLUMNS)
+
+# Axes of the dense count array, in axis order
+CUBE_AXES = ['country_code', 'discipline', 'medal_type', 'gender', 'medal_date']
+
+
+class MedalCube:
+    """Dense medal counts with one axis per dimension in CUBE_AXES.
+
+    ``country`` and ``Continent`` are derived dimensions: both are functions of
+    ``country_code``, so they are answered by mapping onto that axis.
+    """
+
+    def __init__(self, counts, axes, derived):
+        self.counts = counts
+        self.axes = axes
+        self.derived = derived
+
+    def slice(self, **selections):
+        """Restricts the cube to the given labels per dimension.
+
+        A selection of None leaves that dimension untouched; an empty one leaves no medals.
+        """
+        counts, axes = self.counts, dict(self.axes)
+        for dim, labels in selections.items():
+            if labels is None:
+                continue
+            if dim in self.derived:
+                mapping = self.derived[dim]
+                dim, labels = 'country_code', mapping.index[mapping.isin(list(labels))]
+            positions = axes[dim].get_indexer(pd.Index(list(labels)).unique())
+            positions = np.sort(positions[positions >= 0])
+            counts = np.take(counts, positions, axis=CUBE_AXES.index(dim))
+            axes[dim] = axes[dim][positions]
+        return MedalCube(counts, axes, self.derived)
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def rollup(self, *dims):
+        """Sums the cube down to ``dims``; returns the non-empty cells with a ``count`` column."""
+        base = {d if d in self.axes else 'country_code' for d in dims}
+        kept = [d for d in CUBE_AXES if d in base]
+        summed_axes = tuple(i for i, d in enumerate(CUBE_AXES) if d not in base)
+        reduced = self.counts.sum(axis=summed_axes)
+
+        index = pd.MultiIndex.from_product([self.axes[d] for d in kept], names=kept)
+        frame = pd.DataFrame({'count': reduced.ravel()}, index=index).reset_index()
+        frame = frame[frame['count'] > 0]
+
+        derived = [d for d in dims if d in self.derived]
+        for d in derived:
+            frame[d] = frame['country_code'].map(self.derived[d])
+        if derived:
+            frame = frame.groupby(list(dims), observed=True, as_index=False)['count'].sum()
+        return frame[list(dims) + ['count']].reset_index(drop=True)
+
+    def top_k(self, dim, k):
+        return self.rollup(dim).nlargest(k, 'count').reset_index(drop=True)
+
+    def updated(self, added, removed):
+        """A new cube with the ``added`` medal rows counted in and the ``removed`` ones taken out.
+
+        None when a row carries a label missing from an axis; the cube must then be rebuilt.
+        """
+        if added.empty and removed.empty:
+            return self
+        counts = self.counts.copy()
+        for rows, sign in ((added, 1), (removed, -1)):
+            rows = rows.dropna(subset=CUBE_AXES)
+            positions = [self.axes[d].get_indexer(rows[d]) for d in CUBE_AXES]
+            if any((p < 0).any() for p in positions):
+                return None
+            np.add.at(counts, tuple(positions), sign)
+        return MedalCube(counts, self.axes, self.derived)
+
+    def save(self, path):
+        """Writes the cube to an ``.npz`` file; labels are stored as plain arrays, no pickling."""
+        arrays = {'counts': self.counts}
+        for dim, axis in self.axes.items():
+            arrays['axis_' + dim] = axis.to_numpy(dtype=str) if is_text_index(axis) else axis.to_numpy()
+        for dim, mapping in self.derived.items():
+            arrays['derived_' + dim] = mapping.to_numpy(dtype=str)
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a cube written by ``save``."""
+        with np.load(path) as arrays:
+            axes = {dim: pd.Index(arrays['axis_' + dim], name=dim) for dim in CUBE_AXES}
+            derived = {name[len('derived_'):]: pd.Series(arrays[name], index=axes['country_code'])
+                       for name in arrays.files if name.startswith('derived_')}
+            return cls(arrays['counts'], axes, derived)
+
+
+def is_text_index(index):
+    return pd.api.types.is_string_dtype(index.dtype) or index.dtype == object
+
+
+def build_medal_cube(medals, noc_dimension):
+    """Counts ``medals`` rows into a MedalCube; rows missing any axis value are dropped."""
+    frame = medals.dropna(subset=CUBE_AXES)
+
+    axes, codes = {}, []
+    for dim in CUBE_AXES:
+        categorical = pd.Categorical(frame[dim]).remove_unused_categories()
+        axes[dim] = pd.Index(categorical.categories, name=dim)
+        codes.append(categorical.codes)
+
+    shape = tuple(len(axes[d]) for d in CUBE_AXES)
+    flat = np.ravel_multi_index(codes, shape)
+    counts = np.bincount(flat, minlength=int(np.prod(shape))).astype(np.int32).reshape(shape)
+
+    names = frame.groupby('country_code', observed=True)['country'].first()
+    continents = noc_dimension.set_index('code')['Continent'].astype(str)
+    derived = {
+        'country': names.astype(str).reindex(axes['country_code']),
+        'Continent': continents.reindex(axes['country_code']).fillna('Unknown'),
+    }
+    return MedalCube(counts, axes, derived)
+
+
+@generation_cache
+def load_medal_cube():
+    """Builds the medal cube once per data version; None when the medals table is unavailable."""
+    path = artifact_path('medal_cube.npz')
+    if path is not None:
+        return MedalCube.load(path)
+    medals = load_table('medals', tuple(CUBE_AXES) + ('country',))
+    if medals.empty or not set(CUBE_AXES + ['country']).issubset(medals.columns):
+        return None
+
+    # On a refresh, apply only the changed medal rows when the NOCs did not change
+    previous = current_generation().previous
+    cube = previous.peek(load_medal_cube.__wrapped__, ()) if previous else None
+    nocs = table_update('nocs')
+    changes = table_changes('medals')
+    if cube is not None and changes is not None and nocs is not None and nocs.order is None:
+        cube = cube.updated(*changes)
+        if cube is not None:
+            return cube
+    return build_medal_cube(medals, load_noc_dimension())
+
+
+def filter_cube(cube, spec, dimensions=('country', 'sport', 'medal_type')):
+    """Slices ``cube`` by a sidebar FilterSpec, with the same semantics as utils.filter_table."""
+    selections = {}
+    if 'country' in dimensions:
+        selections['country'] = effective_countries(spec) or None
+    if 'sport' in dimensions:
+        selections['discipline'] = spec.sports or None
+    if 'medal_type' in dimensions:
+        selections['medal_type'] = [MEDAL_COLUMNS[m] for m in spec.medal_types if m in MEDAL_COLUMNS]
+    return cube.slice(**selections)
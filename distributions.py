@@ -0,0 +1,54 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Whiskers reach the furthest points within this many interquartile ranges of the box, as in Plotly
+WHISKER_IQR = 1.5
+
+
+def box_stats(df, value, by):
+    """Box plot statistics of ``value`` per group of the ``by`` columns, computed server-side.
+
+    One row per group: ``count``, ``q1``, ``median``, ``q3`` (linear interpolation, Plotly's
+    default quartile method), the whisker ends ``lowerfence`` and ``upperfence`` (the most
+    extreme values within WHISKER_IQR interquartile ranges of the box), and ``outliers``, the
+    list of values beyond them. Rows with no ``value`` are ignored.
+    """
+    by = list(by)
+    values = df.loc[df[value].notna(), by + [value]]
+    if values.empty:
+        return pd.DataFrame(columns=by + ['count', 'q1', 'median', 'q3', 'lowerfence', 'upperfence', 'outliers'])
+
+    grouped = values.groupby(by, observed=True, sort=True)[value]
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+    stats.insert(0, 'count', grouped.size())
+    reach = WHISKER_IQR * (stats['q3'] - stats['q1'])
+
+    # Each row's group limits, aligned to the rows so one comparison marks every outlier
+    bounds = pd.DataFrame({'low': stats['q1'] - reach, 'high': stats['q3'] + reach})
+    limits = values[by].join(bounds, on=by)
+    inside = values[value].between(limits['low'], limits['high'])
+    kept = values[inside].groupby(by, observed=True)[value]
+    stats['lowerfence'] = kept.min()
+    stats['upperfence'] = kept.max()
+    stats['outliers'] = values[~inside].groupby(by, observed=True)[value].agg(list)
+    stats['outliers'] = stats['outliers'].apply(lambda v: v if isinstance(v, list) else [])
+    return stats.reset_index()
+
+
+def box_figure(stats, x, color=None, title=None, value='value'):
+    """A grouped box plot drawn from box_stats, so the figure holds one box per group, not every row."""
+    fig = go.Figure()
+    colors = px.colors.qualitative.Plotly
+    groups = stats.groupby(color, observed=True, sort=False) if color else [(None, stats)]
+    for i, (name, group) in enumerate(groups):
+        fig.add_trace(go.Box(
+            name=str(name) if name is not None else value, x=group[x].astype(str).tolist(),
+            q1=group['q1'].tolist(), median=group['median'].tolist(), q3=group['q3'].tolist(),
+            lowerfence=group['lowerfence'].tolist(), upperfence=group['upperfence'].tolist(),
+            y=group['outliers'].tolist(), boxpoints='outliers', marker_color=colors[i % len(colors)],
+            offsetgroup=str(name), legendgroup=str(name),
+        ))
+    fig.update_layout(boxmode='group', title=title, xaxis_title=x, yaxis_title=value, legend_title_text=color)
+    return fig
@@ -0,0 +1,172 @@
+import os
+import logging
+
+from utils import (MEDAL_COLUMNS, generation_cache, shared_table, load_table, load_noc_dimension,
+                   effective_countries, filter_table)
+from cube import CUBE_AXES, load_medal_cube, filter_cube
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Engine the pages query through: 'pandas' (default) or 'duckdb'
+ENGINE = os.environ.get('QUERY_ENGINE', 'pandas').lower()
+
+ALL_DIMENSIONS = ('country', 'sport', 'medal_type')
+
+
+class PandasEngine:
+    """Answers the page queries from the medal cube and the in-memory tables."""
+
+    name = 'pandas'
+
+    def has_medals(self):
+        return load_medal_cube() is not None
+
+    def medal_counts(self, spec, by, dimensions=ALL_DIMENSIONS):
+        """Medal counts under ``spec`` grouped by the cube dimensions ``by``, with a ``count`` column."""
+        return filter_cube(load_medal_cube(), spec, dimensions).rollup(*by)
+
+    def medal_total(self, spec, dimensions=ALL_DIMENSIONS):
+        return filter_cube(load_medal_cube(), spec, dimensions).total()
+
+    def top_countries(self, spec, k, dimensions=ALL_DIMENSIONS):
+        """The ``k`` countries with the most medals under ``spec``; ties go to the first name."""
+        return filter_cube(load_medal_cube(), spec, dimensions).top_k('country', k)
+
+    def country_medal_totals(self, spec):
+        """``country_code``, ``country``, ``iso3`` and ``Filtered_Total``: medals_total summed over the selected
+        medal types, with the ISO alpha-3 code of each NOC from the NOC dimension (missing for neutral teams)."""
+        medals_total = load_table('medals_total', ('country_code', 'country') + tuple(MEDAL_COLUMNS.values()))
+        medals_total = filter_table(medals_total, 'medals_total', spec)
+        columns = [MEDAL_COLUMNS[m] for m in MEDAL_COLUMNS if m in spec.medal_types]
+        totals = medals_total[['country_code', 'country']].copy()
+        iso3 = load_noc_dimension().set_index('code')['iso3']
+        totals['iso3'] = totals['country_code'].astype(str).map(iso3)
+        totals['Filtered_Total'] = medals_total[columns].sum(axis=1) if columns else 0
+        return totals.reset_index(drop=True)
+
+
+# SQL for each cube dimension over ``medals m LEFT JOIN noc_dimension n``
+DIMENSION_SQL = {
+    'country_code': 'm.country_code', 'country': 'm.country',
+    'Continent': "coalesce(n.Continent, 'Unknown')", 'discipline': 'm.discipline',
+    'medal_type': 'm.medal_type', 'gender': 'm.gender', 'medal_date': 'm.medal_date',
+}
+
+
+class DuckDBEngine:
+    """Answers the same queries as PandasEngine with SQL in an in-process DuckDB.
+
+    Filters, the medals to NOC dimension join and the group-bys all run inside DuckDB, over
+    the tables of duckdb_connection, so only the aggregated result reaches pandas.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def query(self, sql, params=()):
+        # Cursors are independent connections to the same database, safe to use from any session
+        cursor = self.connection.cursor()
+        try:
+            return cursor.execute(sql, list(params)).df()
+        finally:
+            cursor.close()
+
+    def where(self, spec, dimensions):
+        """WHERE clause and parameters for ``spec``, matching utils.filter_mask and cube.filter_cube."""
+        clauses = [f'm.{axis} IS NOT NULL' for axis in CUBE_AXES]
+        params = []
+        selections = {
+            'country': ('m.country', effective_countries(spec)),
+            'sport': ('m.discipline', spec.sports),
+            'medal_type': ('m.medal_type', [MEDAL_COLUMNS[m] for m in spec.medal_types if m in MEDAL_COLUMNS]),
+        }
+        for dimension in dimensions:
+            column, values = selections[dimension]
+            if dimension != 'medal_type' and not values:
+                continue
+            clauses.append(f'list_contains(?, {column})')
+            params.append([str(v) for v in values])
+        return ' AND '.join(clauses), params
+
+    def has_medals(self):
+        return 'medals' in self.query("SELECT table_name FROM information_schema.tables")['table_name'].tolist()
+
+    def medal_counts(self, spec, by, dimensions=ALL_DIMENSIONS):
+        where, params = self.where(spec, dimensions)
+        columns = ', '.join(f'{DIMENSION_SQL[d]} AS "{d}"' for d in by)
+        order = ', '.join(f'"{d}"' for d in by)
+        counts = self.query(f"""
+            SELECT {columns}, count(*) AS count
+            FROM medals m LEFT JOIN noc_dimension n ON m.country_code = n.code
+            WHERE {where}
+            GROUP BY ALL ORDER BY {order}
+        """, params)
+        if 'medal_date' in counts.columns:
+            counts['medal_date'] = counts['medal_date'].astype('datetime64[ns]')
+        return counts
+
+    def medal_total(self, spec, dimensions=ALL_DIMENSIONS):
+        where, params = self.where(spec, dimensions)
+        return int(self.query(f"SELECT count(*) AS count FROM medals m WHERE {where}", params)['count'].iloc[0])
+
+    def top_countries(self, spec, k, dimensions=ALL_DIMENSIONS):
+        where, params = self.where(spec, dimensions)
+        return self.query(f"""
+            SELECT m.country AS country, count(*) AS count
+            FROM medals m WHERE {where}
+            GROUP BY ALL ORDER BY count DESC, country LIMIT {int(k)}
+        """, params)
+
+    def country_medal_totals(self, spec):
+        columns = [MEDAL_COLUMNS[m] for m in MEDAL_COLUMNS if m in spec.medal_types]
+        total = ' + '.join(f'"{c}"' for c in columns) or '0'
+        params, where = [], 'TRUE'
+        countries = effective_countries(spec)
+        if countries:
+            where, params = 'list_contains(?, t.country)', [[str(c) for c in countries]]
+        return self.query(f"""
+            SELECT t.country_code, t.country, n.iso3, {total} AS Filtered_Total
+            FROM medals_total t LEFT JOIN noc_dimension n ON t.country_code = n.code
+            WHERE {where}
+        """, params)
+
+
+def copy_frame(connection, name, frame):
+    """Copies ``frame`` into table ``name``; a registered frame is only visible to its own cursor."""
+    connection.register('frame', frame)
+    connection.execute(f"CREATE TABLE {name} AS SELECT * FROM frame")
+    connection.unregister('frame')
+
+
+@generation_cache
+def duckdb_connection():
+    """In-process DuckDB holding this generation's copy of each table the queries use.
+
+    The tables are copied in from the generation's own frames, not read from the Parquet
+    cache: a refresh rewrites (or, when incremental, skips) those files, and a session pinned
+    to an older generation must keep getting that generation's data.
+    """
+    connection = duckdb.connect()
+    for name in ('medals', 'medals_total'):
+        frame = shared_table(name)
+        if not frame.empty:
+            copy_frame(connection, name, frame)
+    copy_frame(connection, 'noc_dimension', load_noc_dimension())
+    return connection
+
+
+def query_engine():
+    """The engine selected by QUERY_ENGINE; pandas when DuckDB is requested but not installed."""
+    if ENGINE == 'duckdb':
+        if DUCKDB_AVAILABLE:
+            return DuckDBEngine(duckdb_connection())
+        logger.warning("QUERY_ENGINE=duckdb but duckdb is not installed; using pandas")
+    return PandasEngine()
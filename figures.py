@@ -0,0 +1,82 @@
+import streamlit as st
+import plotly.io as pio
+import threading
+from collections import OrderedDict
+
+from utils import current_generation, effective_countries
+from profiling import span, count_cache
+
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    """Thread-safe LRU of serialized figure JSON, bounded by the total size of the stored JSON."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is not None:
+                self._entries.move_to_end(key)
+            return spec
+
+    def put(self, key, spec):
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = spec
+            self.size += len(spec)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+@st.cache_resource
+def figure_cache():
+    """The process-wide figure cache shared by every session."""
+    return FigureCache(FIGURE_CACHE_MAX_BYTES)
+
+
+def filter_key(spec, dimensions=('country', 'sport', 'medal_type')):
+    """The part of a FilterSpec a chart depends on, for use in a figure cache key."""
+    key = []
+    if 'country' in dimensions:
+        key.append(effective_countries(spec))
+    if 'sport' in dimensions:
+        key.append(spec.sports)
+    if 'medal_type' in dimensions:
+        key.append(spec.medal_types)
+    return tuple(key)
+
+
+def cached_figure(chart_id, key, build):
+    """Returns the figure for ``chart_id`` under ``key``, calling ``build`` only on a cache miss.
+
+    ``build`` returns a Plotly figure, or None when there is nothing to plot; both outcomes are
+    cached per (chart id, key, data version). Hits are rebuilt from the stored JSON, skipping
+    the pandas work and Plotly Express entirely.
+    """
+    cache = figure_cache()
+    cache_key = (chart_id, key, current_generation().version)
+    spec = cache.get(cache_key)
+    count_cache('figure:' + chart_id, spec is not None)
+    if spec is not None:
+        with span('figure_from_json', chart=chart_id):
+            return pio.from_json(spec, skip_invalid=True) if spec else None
+
+    with span('figure_build', chart=chart_id):
+        fig = build()
+    with span('figure_to_json', chart=chart_id):
+        cache.put(cache_key, fig.to_json() if fig is not None else '')
+    return fig
+
+
+def plotly_chart(fig, **kwargs):
+    """``st.plotly_chart``, timed as the chart's serialization to the browser."""
+    with span('plotly_chart'):
+        return st.plotly_chart(fig, **kwargs)
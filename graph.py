@@ -0,0 +1,220 @@
+import pandas as pd
+import numpy as np
+
+from utils import generation_cache, previous_result, load_table, load_bridge, entity_vocabulary, entity_ids
+
+# Node kinds, in the order their id ranges are laid out in the graph
+NODE_KINDS = ['athlete', 'team', 'coach', 'discipline', 'noc']
+
+
+class RelationGraph:
+    """Undirected athlete/team/coach/discipline/NOC graph in compressed sparse row form.
+
+    Node ids are grouped by kind, and each node's neighbours are stored sorted, so the
+    neighbours of one kind are a contiguous slice found with two binary searches.
+    """
+
+    def __init__(self, keys, labels, edges):
+        self.keys = keys
+        self.labels = labels
+        self.offsets, start = {}, 0
+        for kind in NODE_KINDS:
+            self.offsets[kind] = start
+            start += len(keys[kind])
+        self.size = start
+
+        src, dst = [], []
+        for kind_a, ids_a, kind_b, ids_b in edges:
+            valid = (ids_a >= 0) & (ids_b >= 0)
+            a = ids_a[valid] + self.offsets[kind_a]
+            b = ids_b[valid] + self.offsets[kind_b]
+            src += [a, b]
+            dst += [b, a]
+        pairs = np.unique(np.column_stack([np.concatenate(src), np.concatenate(dst)]).astype(np.int64), axis=0) \
+            if src else np.empty((0, 2), dtype=np.int64)
+
+        self.indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs[:, 0], minlength=self.size), out=self.indptr[1:])
+        self.indices = pairs[:, 1].astype(np.int32)
+
+    def node_ids(self, kind, keys):
+        """Local ids of ``keys`` within ``kind``; unknown keys are dropped."""
+        ids = self.keys[kind].get_indexer(pd.Index(keys))
+        return ids[ids >= 0]
+
+    def step(self, ids, kind, to_kind):
+        """Sorted unique local ids of the ``to_kind`` neighbours of the ``kind`` nodes ``ids``."""
+        lo_id, hi_id = self.offsets[to_kind], self.offsets[to_kind] + len(self.keys[to_kind])
+        found = []
+        for node in np.asarray(ids) + self.offsets[kind]:
+            row = self.indices[self.indptr[node]:self.indptr[node + 1]]
+            found.append(row[np.searchsorted(row, lo_id):np.searchsorted(row, hi_id)])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found)) - lo_id
+
+    def reach(self, kind, keys, path):
+        """Local ids reached from the ``kind`` nodes ``keys`` by following the kinds in ``path``."""
+        ids = self.node_ids(kind, keys)
+        for to_kind in path:
+            ids = self.step(ids, kind, to_kind)
+            kind = to_kind
+        return ids
+
+    def frame(self, kind, ids):
+        """``code``/``name`` frame of the named ``kind`` nodes among ``ids``, sorted by name.
+
+        Athletes and coaches only known by code from ``teams`` have no name and are left out.
+        """
+        frame = pd.DataFrame({'code': self.keys[kind][ids], 'name': self.labels[kind][ids]})
+        return frame.dropna(subset=['name']).sort_values('name', ignore_index=True)
+
+    def pairs(self, kind, ids):
+        """(NOC, discipline) local id pairs of the ``kind`` nodes ``ids``, taken node by node.
+
+        Athletes and coaches each have one NOC, so a node's pairs are its disciplines with that NOC.
+        """
+        nocs, disciplines = [], []
+        for node in np.asarray(ids):
+            grid = np.meshgrid(self.step([node], kind, 'noc'), self.step([node], kind, 'discipline'))
+            nocs.append(grid[0].ravel())
+            disciplines.append(grid[1].ravel())
+        if not nocs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(nocs), np.concatenate(disciplines)
+
+    def paired(self, nocs, disciplines, to_kind):
+        """Local ids of the ``to_kind`` nodes linked to both the NOC and the discipline of one of the pairs."""
+        found = [np.intersect1d(self.step([noc], 'noc', to_kind), self.step([discipline], 'discipline', to_kind))
+                 for noc, discipline in set(zip(nocs.tolist(), disciplines.tolist()))]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def team_coaches(self, athlete):
+        """Local ids of the coaches listed on the teams of ``athlete``.
+
+        Team staff lists also hold doctors and other staff shared between a NOC's teams; only
+        codes found in ``coaches`` (the nodes with a name) count as coaches.
+        """
+        ids = self.reach('athlete', [athlete], ('team', 'coach'))
+        return ids[pd.notna(self.labels['coach'][ids])]
+
+    def national_coaches(self, athlete):
+        """Local ids of the coaches of ``athlete``'s NOC in one of the athlete's disciplines.
+
+        A guess for athletes with no team entry: nothing links these coaches to the athlete.
+        """
+        return self.paired(*self.pairs('athlete', self.node_ids('athlete', [athlete])), 'coach')
+
+    def coaches_of(self, athlete):
+        """``(coach ids, inferred)``: the team coaches of ``athlete`` when there are any, otherwise
+        its national_coaches, with ``inferred`` set."""
+        coaches = self.team_coaches(athlete)
+        if len(coaches):
+            return coaches, False
+        return self.national_coaches(athlete), True
+
+    def teammates(self, athlete):
+        """Local ids of the athletes sharing a team with ``athlete``, excluding them."""
+        ids = self.reach('athlete', [athlete], ('team', 'athlete'))
+        return ids[ids != self.keys['athlete'].get_loc(athlete)]
+
+    def shared_coach(self, athlete):
+        """``(athlete ids, inferred)``: the other athletes sharing one of ``athlete``'s coaches.
+
+        Team coaches are followed to their teams only. Inferred coaches (see coaches_of) are
+        matched to the athletes of their own NOC and discipline, pair by pair.
+        """
+        coaches, inferred = self.coaches_of(athlete)
+        if inferred:
+            ids = self.paired(*self.pairs('coach', coaches), 'athlete')
+        else:
+            ids = self.reach('coach', self.keys['coach'][coaches], ('team', 'athlete'))
+        return ids[ids != self.keys['athlete'].get_loc(athlete)], inferred
+
+def kind_ids(keys, values):
+    return keys.get_indexer(pd.Index(values)).astype(np.int64)
+
+
+def team_member_names(team_athletes, team_athlete_names):
+    """Athlete code -> name from the parallel ``teams.athletes_codes`` and ``teams.athletes`` lists.
+
+    Only teams whose two lists have the same length are paired.
+    """
+    codes, names = team_athletes['row'].value_counts(), team_athlete_names['row'].value_counts()
+    paired = codes.index[codes.eq(names.reindex(codes.index))]
+    codes = team_athletes[team_athletes['row'].isin(paired)]
+    names = team_athlete_names[team_athlete_names['row'].isin(paired)]
+    return pd.Series(names['athletes'].astype(str).to_numpy(), index=codes['athletes_codes'].to_numpy())
+
+
+def build_relation_graph(athletes, teams, coaches, athlete_disciplines, team_athletes, team_coaches,
+                         team_athlete_names):
+    """Builds the RelationGraph from the loaded tables and their list bridges.
+
+    Athletes missing from ``athletes`` are labelled with the name listed next to their code
+    in ``teams.athletes``.
+    """
+    keys = {
+        'athlete': entity_vocabulary('athlete'),
+        'team': pd.Index(teams['code']),
+        'coach': entity_vocabulary('coach'),
+        'discipline': entity_vocabulary('discipline'),
+        'noc': entity_vocabulary('noc'),
+    }
+    labels = {kind: np.asarray(keys[kind].astype(str), dtype=object) for kind in NODE_KINDS}
+    athlete_names = pd.concat([
+        athletes.dropna(subset=['code']).set_index('code')['name'].astype(str),
+        team_member_names(team_athletes, team_athlete_names),
+    ])
+    athlete_names = athlete_names[~athlete_names.index.duplicated()]
+    athlete_names = athlete_names.reindex(keys['athlete'])
+    labels['athlete'] = athlete_names.to_numpy(dtype=object)
+    labels['team'] = np.asarray(teams['team'].astype(str) + ' - ' + teams['events'].astype(str))
+    coach_names = coaches.dropna(subset=['code']).drop_duplicates('code').set_index('code')['name']
+    coach_names = coach_names.reindex(keys['coach'])
+    labels['coach'] = coach_names.to_numpy(dtype=object)
+
+    athlete_ids = entity_ids(athletes['code']).astype(np.int64)
+    coach_ids = entity_ids(coaches['code']).astype(np.int64)
+    team_rows = teams.index.get_indexer(team_athletes['row'])
+    coach_rows = teams.index.get_indexer(team_coaches['row'])
+    disciplines_rows = athletes.index.get_indexer(athlete_disciplines['row'])
+
+    edges = [
+        ('athlete', athlete_ids, 'noc', entity_ids(athletes['country_code']).astype(np.int64)),
+        ('athlete', athlete_ids[disciplines_rows], 'discipline',
+         kind_ids(keys['discipline'], athlete_disciplines['disciplines'].astype(str))),
+        ('team', team_rows.astype(np.int64), 'athlete',
+         kind_ids(keys['athlete'], team_athletes['athletes_codes'])),
+        ('team', coach_rows.astype(np.int64), 'coach',
+         kind_ids(keys['coach'], team_coaches['coaches_codes'])),
+        ('team', np.arange(len(teams)), 'discipline', entity_ids(teams['discipline']).astype(np.int64)),
+        ('team', np.arange(len(teams)), 'noc', entity_ids(teams['country_code']).astype(np.int64)),
+        ('coach', coach_ids, 'discipline', entity_ids(coaches['disciplines']).astype(np.int64)),
+        ('coach', coach_ids, 'noc', entity_ids(coaches['country_code']).astype(np.int64)),
+    ]
+    return RelationGraph(keys, labels, edges)
+
+
+@generation_cache
+def load_relation_graph():
+    """Builds the relationship graph once per data version; None when a source table is unavailable.
+
+    Kept across refreshes that leave athletes, teams and coaches untouched: node ids are
+    local to the graph, so changes elsewhere don't affect it.
+    """
+    graph = previous_result(load_relation_graph.__wrapped__, (), ('athletes', 'teams', 'coaches'))
+    if graph is not None:
+        return graph
+    athletes = load_table('athletes', ('code', 'name', 'country_code'))
+    teams = load_table('teams', ('code', 'team', 'events', 'discipline', 'country_code'))
+    coaches = load_table('coaches', ('code', 'name', 'country_code', 'disciplines'))
+    if athletes.empty or teams.empty or coaches.empty:
+        return None
+    return build_relation_graph(athletes, teams, coaches,
+                                load_bridge('athletes', 'disciplines'),
+                                load_bridge('teams', 'athletes_codes'),
+                                load_bridge('teams', 'coaches_codes'),
+                                load_bridge('teams', 'athletes'))
@@ -2,29 +2,31 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import ast
-from utils import load_data, process_data, sidebar_filters, safe_parse
+from utils import load_data, process_data, sidebar_filters, filter_table, pin_generation
+from engine import query_engine
+from figures import cached_figure, filter_key, plotly_chart
+from profiling import start_rerun, span, profiling_panel
+from warmup import start_background_refresh
 
 
 
 st.set_page_config(
     layout="wide"
 )
-
-data = load_data()
+start_background_refresh()
+pin_generation()
+start_rerun('Overview')
+
+data = load_data(columns={
+    'athletes': ['country'],
+    'events': ['sport'],
+    'nocs': ['country'],
+})
 data = process_data(data)
 
 # Sidebar Filters
-selected_continent, selected_countries, selected_sports, selected_medal_types = sidebar_filters(data)
-
-# Helper function to get countries from continent selection
-def get_filtered_countries(data, selected_continent, selected_countries):
-    if selected_countries:
-        return selected_countries
-    if selected_continent and 'nocs' in data:
-        return data['nocs'][data['nocs']['Continent'].isin(selected_continent)]['country'].unique().tolist()
-    return []
-
-effective_countries = get_filtered_countries(data, selected_continent, selected_countries)
+filters = sidebar_filters(data)
+selected_continent, selected_countries, selected_sports, selected_medal_types = filters
 
 # Main Page Content
 st.title("🏅 Paris 2024 Olympic Games Dashboard")
@@ -38,31 +40,21 @@ st.header("Key Performance Indicators")
 
 athletes_df = data.get('athletes', pd.DataFrame())
 
-athletes_df['disciplines'] = athletes_df['disciplines'].apply(safe_parse)
-
-
 if not athletes_df.empty:
-    if effective_countries:
-        athletes_df = athletes_df[athletes_df['country'].isin(effective_countries)]
-    if selected_sports:
-        athletes_df = athletes_df[athletes_df['disciplines'].apply(lambda x: any(str(d) in selected_sports for d in x))]
+    athletes_df = filter_table(athletes_df, 'athletes', filters)
 
 total_athletes = len(athletes_df)
 
 nocs_df = data.get('nocs', pd.DataFrame())
 if not nocs_df.empty:
-    if effective_countries:
-        col = 'country' if 'country' in nocs_df.columns else 'noc'
-        if col in nocs_df.columns:
-            nocs_df = nocs_df[nocs_df[col].isin(effective_countries)]
+    nocs_df = filter_table(nocs_df, 'nocs', filters)
 
 total_countries = len(nocs_df)
 
 
 events_df = data.get('events', pd.DataFrame())
 if not events_df.empty:
-    if selected_sports:
-        events_df = events_df[events_df['sport'].isin(selected_sports)]
+    events_df = filter_table(events_df, 'events', filters)
     total_sports = events_df['sport'].nunique() if 'sport' in events_df.columns else 0
     total_events = len(events_df)
 else:
@@ -70,21 +62,12 @@ else:
     total_events = 0
 
 
-medals_total_df = data.get('medals_total', pd.DataFrame())
+engine = query_engine()
+has_medals = engine.has_medals()
 total_medals_awarded = 0
-if not medals_total_df.empty:
-
-    if effective_countries:
-        medals_total_df = medals_total_df[medals_total_df['country'].isin(effective_countries)]
-    
-
-    medal_mapping = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
-    medal_cols = [medal_mapping[m] for m in ['Gold', 'Silver', 'Bronze'] if m in selected_medal_types and medal_mapping[m] in medals_total_df.columns]
-    
-    if medal_cols:
-        total_medals_awarded = medals_total_df[medal_cols].sum().sum()
-    else:
-        total_medals_awarded = 0
+if has_medals:
+    with span('medal_total'):
+        total_medals_awarded = engine.medal_total(filters, ('country', 'medal_type'))
 
 col1, col2, col3, col4, col5 = st.columns(5)
 col1.metric("Total Athletes", total_athletes)
@@ -95,37 +78,40 @@ col5.metric("Total Events", total_events)
 
 col_viz1, col_viz2 = st.columns(2)
 
+medal_key = filter_key(filters, ('country', 'medal_type'))
+
+def build_medal_pie():
+    medal_dist_df = engine.medal_counts(filters, ('medal_type',), ('country', 'medal_type'))
+    medal_dist_df = medal_dist_df.rename(columns={'medal_type': 'Medal Type', 'count': 'Count'})
+    medal_dist_df['Medal Type'] = medal_dist_df['Medal Type'].str.replace(' Medal', '')
+
+    if medal_dist_df.empty or medal_dist_df['Count'].sum() == 0:
+        return None
+    return px.pie(medal_dist_df, values='Count', names='Medal Type', 
+                  color='Medal Type',
+                  color_discrete_map={'Gold': '#FFD700', 'Silver': '#C0C0C0', 'Bronze': '#CD7F32'},
+                  hole=0.4)
+
+def build_top_10():
+    top_10 = engine.top_countries(filters, 10, ('country', 'medal_type'))
+    top_10 = top_10.rename(columns={'count': 'Selected Total'})
+    if top_10.empty:
+        return None
+    fig_bar = px.bar(top_10, x='Selected Total', y='country', orientation='h',
+                     text='Selected Total',
+                     labels={'Selected Total': 'Total Medals', 'country': 'Country'},
+                     color='Selected Total',
+                     color_continuous_scale='Viridis')
+    fig_bar.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig_bar
+
 with col_viz1:
     st.subheader("Global Medal Distribution")
-    medals_agg = data.get('medals_total', pd.DataFrame())
-
-    if not medals_agg.empty:
-        if effective_countries:
-            medals_agg = medals_agg[medals_agg['country'].isin(effective_countries)]
-        
-
-        medal_counts = {
-            'Medal Type': [],
-            'Count': []
-        }
-        medal_mapping = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
-        for m_type in ['Gold', 'Silver', 'Bronze']:
-            col_name = medal_mapping.get(m_type)
-            if col_name and col_name in medals_agg.columns:
-                medal_counts['Medal Type'].append(m_type)
-                medal_counts['Count'].append(medals_agg[col_name].sum())
-        
-        medal_dist_df = pd.DataFrame(medal_counts)
-        
-
-        medal_dist_df = medal_dist_df[medal_dist_df['Medal Type'].isin(selected_medal_types)]
-
-        if not medal_dist_df.empty and medal_dist_df['Count'].sum() > 0:
-            fig_pie = px.pie(medal_dist_df, values='Count', names='Medal Type', 
-                             color='Medal Type',
-                             color_discrete_map={'Gold': '#FFD700', 'Silver': '#C0C0C0', 'Bronze': '#CD7F32'},
-                             hole=0.4)
-            st.plotly_chart(fig_pie, use_container_width=True)
+
+    if has_medals:
+        fig_pie = cached_figure('overview_medal_pie', medal_key, build_medal_pie)
+        if fig_pie is not None:
+            plotly_chart(fig_pie, use_container_width=True)
         else:
             st.info("No medal data available for the current selection.")
     else:
@@ -134,35 +120,16 @@ with col_viz1:
 
 with col_viz2:
     st.subheader("Top 10 Countries by Medal Count")
-    medals_standings = data.get('medals_total', pd.DataFrame())
-    if not medals_standings.empty:
-        
-        if effective_countries:
-             col = 'country' if 'country' in medals_standings.columns else 'noc'
-             if col in medals_standings.columns:
-                medals_standings = medals_standings[medals_standings[col].isin(effective_countries)]
-        
-        medal_mapping = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
-        medal_cols = [medal_mapping[m] for m in ['Gold', 'Silver', 'Bronze'] if m in selected_medal_types and medal_mapping[m] in medals_standings.columns]
-        
-        if medal_cols:
-            medals_standings['Selected Total'] = medals_standings[medal_cols].sum(axis=1)
-        if medal_cols:
-            medals_standings['Selected Total'] = medals_standings[medal_cols].sum(axis=1)
-            
-            top_10 = medals_standings.sort_values(by='Selected Total', ascending=False).head(10)
-            
-            if not top_10.empty:
-                fig_bar = px.bar(top_10, x='Selected Total', y='country', orientation='h',
-                                 text='Selected Total',
-                                 labels={'Selected Total': 'Total Medals', 'country': 'Country'},
-                                 color='Selected Total',
-                                 color_continuous_scale='Viridis')
-                fig_bar.update_layout(yaxis={'categoryorder':'total ascending'})
-                st.plotly_chart(fig_bar, use_container_width=True)
+    if has_medals:
+        if selected_medal_types:
+            fig_bar = cached_figure('overview_top_10', medal_key, build_top_10)
+            if fig_bar is not None:
+                plotly_chart(fig_bar, use_container_width=True)
             else:
                 st.info("No data for top 10.")
         else:
             st.info("Select at least one medal type.")
     else:
         st.warning("Medals data not loaded.")
+
+profiling_panel()
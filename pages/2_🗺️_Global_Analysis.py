@@ -6,23 +6,26 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils import load_data, process_data, sidebar_filters
+from utils import load_data, process_data, sidebar_filters, pin_generation
+from engine import query_engine
+from figures import cached_figure, filter_key, plotly_chart
+from profiling import start_rerun, profiling_panel
+from warmup import start_background_refresh
 
 st.set_page_config(page_title="Global Analysis", page_icon="🗺️", layout="wide")
-
-data = load_data()
+start_background_refresh()
+generation = pin_generation()
+start_rerun('Global Analysis')
+
+data = load_data(columns={
+    'events': ['sport'],
+    'medals_total': ['country_code', 'country', 'Gold Medal', 'Silver Medal', 'Bronze Medal'],
+    'nocs': ['code', 'country'],
+})
 data = process_data(data)
 
-selected_continent, selected_countries, selected_sports, selected_medal_types = sidebar_filters(data)
-
-def get_filtered_countries(data, selected_continent, selected_countries):
-    if selected_countries:
-        return selected_countries
-    if selected_continent and 'nocs' in data:
-        return data['nocs'][data['nocs']['Continent'].isin(selected_continent)]['country'].unique().tolist()
-    return []
-
-effective_countries = get_filtered_countries(data, selected_continent, selected_countries)
+filters = sidebar_filters(data)
+selected_continent, selected_countries, selected_sports, selected_medal_types = filters
 
 st.title("🗺️ Global Analysis")
 
@@ -30,159 +33,121 @@ st.title("🗺️ Global Analysis")
 medals_total = data.get('medals_total', pd.DataFrame())
 nocs = data.get('nocs', pd.DataFrame())
 
-if not medals_total.empty and not nocs.empty:
-
-    if 'country' in medals_total.columns and 'country' in nocs.columns:
-        merged_df = pd.merge(medals_total, nocs, on='country', how='left')
-    elif 'country_code' in medals_total.columns and 'code' in nocs.columns:
-        merged_df = pd.merge(medals_total, nocs, left_on='country_code', right_on='code', how='left')
+engine = query_engine()
+
+def build_world_map():
+    # Total Medals per country over the selected medal types, placed by ISO-3 code from the
+    # NOC dimension rather than matched by name in the browser
+    merged_df = engine.country_medal_totals(filters)
+
+    if merged_df.empty:
+        return None
+    unmapped = merged_df.loc[merged_df['iso3'].isna(), 'country'].astype(str)
+    fig = px.choropleth(merged_df.dropna(subset=['iso3']),
+                        locations="iso3",
+                        locationmode='ISO-3',
+                        color="Filtered_Total",
+                        hover_name="country",
+                        hover_data={'iso3': False},
+                        color_continuous_scale=px.colors.sequential.Plasma,
+                        title="Total Medals by Country")
+    if not unmapped.empty:
+        fig.add_annotation(text="Not on the map: " + ", ".join(sorted(unmapped)), showarrow=False,
+                           xref='paper', yref='paper', x=0, y=0, xanchor='left', yanchor='top')
+    return fig
+
+def build_hierarchy(filters, chart_type):
+    hierarchy_df = engine.medal_counts(filters, ('Continent', 'country', 'discipline'))
+    hierarchy_df = hierarchy_df.rename(columns={'count': 'Medal Count'})
+    if hierarchy_df.empty:
+        return None
+
+    if chart_type == "Sunburst":
+        return px.sunburst(hierarchy_df, path=['Continent', 'country', 'discipline'], values='Medal Count',
+                           title="Medal Distribution Hierarchy (Sunburst)")
+    return px.treemap(hierarchy_df, path=['Continent', 'country', 'discipline'], values='Medal Count',
+                      title="Medal Distribution Hierarchy (Treemap)")
+
+# Switching the chart type reruns only this section
+@st.fragment
+def hierarchy_section(generation, filters):
+    pin_generation(generation)
+    chart_type = st.radio("Select Chart Type", ["Sunburst", "Treemap"], horizontal=True)
+    fig_hier = cached_figure('global_hierarchy', (filter_key(filters), chart_type),
+                             lambda: build_hierarchy(filters, chart_type))
+    if fig_hier is not None:
+        plotly_chart(fig_hier, use_container_width=True)
     else:
-        merged_df = medals_total.copy()
-        st.error("Could not merge medals and NOCs data. Check column names.")
+        st.info("No data for Hierarchy chart.")
+
+# Breakdown charts honour the country and medal type filters only
+def build_continent_bars():
+    continent_melted = engine.medal_counts(filters, ('Continent', 'medal_type'), ('country', 'medal_type'))
+    continent_melted = continent_melted.rename(columns={'medal_type': 'Medal Type', 'count': 'Count'})
+    continent_melted['Medal Type'] = continent_melted['Medal Type'].str.replace(' Medal', '')
+    if continent_melted.empty:
+        return None
+    return px.bar(continent_melted, x='Continent', y='Count', color='Medal Type', barmode='group',
+                  color_discrete_map={'Gold': '#FFD700', 'Silver': '#C0C0C0', 'Bronze': '#CD7F32'})
+
+def build_top_20():
+    top_20 = engine.top_countries(filters, 20, ('country', 'medal_type'))['country']
+    top_20_melted = engine.medal_counts(filters, ('country', 'medal_type'), ('country', 'medal_type'))
+    top_20_melted = top_20_melted[top_20_melted['country'].isin(top_20)]
+    top_20_melted = top_20_melted.rename(columns={'medal_type': 'Medal Type', 'count': 'Count'})
+    top_20_melted['Medal Type'] = top_20_melted['Medal Type'].str.replace(' Medal', '')
+    if top_20_melted.empty:
+        return None
+    return px.bar(top_20_melted, x='country', y='Count', color='Medal Type', 
+                  title="Top 20 Countries by Medal Count",
+                  category_orders={'country': list(top_20)},
+                  color_discrete_map={'Gold': '#FFD700', 'Silver': '#C0C0C0', 'Bronze': '#CD7F32'})
 
+if not medals_total.empty and not nocs.empty:
 
-    if effective_countries:
-        merged_df = merged_df[merged_df['country'].isin(effective_countries)]
-    
-    # Calculate Total Medals based on selection
-    medal_mapping = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
-    medal_cols = [medal_mapping[m] for m in ['Gold', 'Silver', 'Bronze'] if m in selected_medal_types and medal_mapping[m] in merged_df.columns]
-
-    if medal_cols:
-        merged_df['Filtered_Total'] = merged_df[medal_cols].sum(axis=1)
-    else:
-        merged_df['Filtered_Total'] = 0
+    if 'country_code' not in medals_total.columns or 'code' not in nocs.columns:
+        st.error("Could not merge medals and NOCs data. Check column names.")
 
     st.subheader("World Medal Map")
-    if not merged_df.empty:
-        fig_map = px.choropleth(merged_df, 
-                                locations="country", 
-                                locationmode='country names',
-                                color="Filtered_Total",
-                                hover_name="country",
-                                color_continuous_scale=px.colors.sequential.Plasma,
-                                title="Total Medals by Country")
-        st.plotly_chart(fig_map, use_container_width=True)
+    fig_map = cached_figure('global_world_map', filter_key(filters, ('country', 'medal_type')), build_world_map)
+    if fig_map is not None:
+        plotly_chart(fig_map, use_container_width=True)
     else:
         st.info("No data available for map.")
 
     st.subheader("Medal Hierarchy by Continent")
 
-    medals_individual = data.get('medals', pd.DataFrame())
+    has_medals = engine.has_medals()
     
-    if not medals_individual.empty and not nocs.empty:
-
-        if 'country_code' in medals_individual.columns and 'code' in nocs.columns:
-             medals_ind_merged = pd.merge(medals_individual, nocs, left_on='country_code', right_on='code', how='left')
-        elif 'country' in medals_individual.columns and 'country' in nocs.columns:
-             medals_ind_merged = pd.merge(medals_individual, nocs, on='country', how='left')
-        else:
-             medals_ind_merged = pd.DataFrame()
-
-        if not medals_ind_merged.empty:
-
-            if 'country' not in medals_ind_merged.columns and 'country_x' in medals_ind_merged.columns:
-                medals_ind_merged = medals_ind_merged.rename(columns={'country_x': 'country'})
-            
-            # Filter
-            if effective_countries:
-                if 'country' in medals_ind_merged.columns:
-                    medals_ind_merged = medals_ind_merged[medals_ind_merged['country'].isin(effective_countries)]
-            if selected_sports:
-                if 'discipline' in medals_ind_merged.columns:
-                    medals_ind_merged = medals_ind_merged[medals_ind_merged['discipline'].isin(selected_sports)] # Assuming 'discipline' or 'sport'
-            
-            # Filter by medal type
-            if 'medal_type' in medals_ind_merged.columns:
-                 medal_mapping = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
-                 selected_medal_values = [medal_mapping[m] for m in selected_medal_types if m in medal_mapping]
-                 medals_ind_merged = medals_ind_merged[medals_ind_merged['medal_type'].isin(selected_medal_values)]
-            
-            # Group for Hierarchy
-
-            if 'Continent' in medals_ind_merged.columns and 'country' in medals_ind_merged.columns and 'discipline' in medals_ind_merged.columns:
-                hierarchy_df = medals_ind_merged.groupby(['Continent', 'country', 'discipline']).size().reset_index(name='Medal Count')
-                
-                if not hierarchy_df.empty:
-                    chart_type = st.radio("Select Chart Type", ["Sunburst", "Treemap"], horizontal=True)
-                    
-                    if chart_type == "Sunburst":
-                        fig_hier = px.sunburst(hierarchy_df, path=['Continent', 'country', 'discipline'], values='Medal Count',
-                                              title="Medal Distribution Hierarchy (Sunburst)")
-                    else:
-                        fig_hier = px.treemap(hierarchy_df, path=['Continent', 'country', 'discipline'], values='Medal Count',
-                                              title="Medal Distribution Hierarchy (Treemap)")
-                        
-                    st.plotly_chart(fig_hier, use_container_width=True)
-                else:
-                    st.info("No data for Hierarchy chart.")
-            else:
-                st.warning("Missing columns for Hierarchy (Continent, country, discipline).")
+    if has_medals:
+        hierarchy_section(generation, filters)
     else:
         st.info("Detailed medal data not available for hierarchy.")
 
+    breakdown_key = filter_key(filters, ('country', 'medal_type'))
+
     # 3. Continent vs. Medals Bar Chart
     st.subheader("Medals by Continent")
-    if 'Continent' in merged_df.columns:
-        # Map selected medal types to actual columns
-        medal_mapping = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
-        
-        # Columns to group by
-        agg_cols = {medal_mapping[m]: 'sum' for m in ['Gold', 'Silver', 'Bronze'] if medal_mapping[m] in merged_df.columns}
-        
-        if agg_cols:
-            continent_medals = merged_df.groupby('Continent').agg(agg_cols).reset_index()
-            
- 
-            reverse_mapping = {v: k for k, v in medal_mapping.items()}
-            continent_medals = continent_medals.rename(columns=reverse_mapping)
-            
-            # Melt for grouped bar chart
-            available_medals = [m for m in ['Gold', 'Silver', 'Bronze'] if m in continent_medals.columns]
-            continent_melted = continent_medals.melt(id_vars='Continent', value_vars=available_medals, 
-                                                     var_name='Medal Type', value_name='Count')
-            # Filter by selected medal types
-            continent_melted = continent_melted[continent_melted['Medal Type'].isin(selected_medal_types)]
-            
-            if not continent_melted.empty:
-                fig_cont = px.bar(continent_melted, x='Continent', y='Count', color='Medal Type', barmode='group',
-                                  color_discrete_map={'Gold': '#FFD700', 'Silver': '#C0C0C0', 'Bronze': '#CD7F32'})
-                st.plotly_chart(fig_cont, use_container_width=True)
-            else:
-                st.info("No data for Continent chart.")
+    if has_medals:
+        fig_cont = cached_figure('global_continent_bars', breakdown_key, build_continent_bars)
+        if fig_cont is not None:
+            plotly_chart(fig_cont, use_container_width=True)
         else:
-             st.info("No medal columns found for aggregation.")
+            st.info("No data for Continent chart.")
     else:
         st.warning("Continent data not available.")
 
     st.subheader("Top 20 Countries Medal Breakdown")
-    if not merged_df.empty:
-        top_20 = merged_df.sort_values(by='Filtered_Total', ascending=False).head(20)
-        
-        # Map selected medal types to actual columns
-        medal_mapping = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
-        
-        # Rename columns for melting
-        reverse_mapping = {v: k for k, v in medal_mapping.items() if v in top_20.columns}
-        top_20 = top_20.rename(columns=reverse_mapping)
-        
-        # Melt
-        available_medals = [m for m in ['Gold', 'Silver', 'Bronze'] if m in top_20.columns]
-        
-        if available_medals:
-            top_20_melted = top_20.melt(id_vars='country', value_vars=available_medals, 
-                                        var_name='Medal Type', value_name='Count')
-            top_20_melted = top_20_melted[top_20_melted['Medal Type'].isin(selected_medal_types)]
-            
-            if not top_20_melted.empty:
-                fig_top20 = px.bar(top_20_melted, x='country', y='Count', color='Medal Type', 
-                                   title="Top 20 Countries by Medal Count",
-                                   color_discrete_map={'Gold': '#FFD700', 'Silver': '#C0C0C0', 'Bronze': '#CD7F32'})
-                st.plotly_chart(fig_top20, use_container_width=True)
-            else:
-                st.info("No data for Top 20 chart.")
+    if has_medals:
+        fig_top20 = cached_figure('global_top_20', breakdown_key, build_top_20)
+        if fig_top20 is not None:
+            plotly_chart(fig_top20, use_container_width=True)
         else:
-             st.info("No medal data available for Top 20.")
+            st.info("No data for Top 20 chart.")
+    else:
+         st.info("No medal data available for Top 20.")
 
 else:
     st.error("Required datasets (medals_total, nocs) not found.")
+
+profiling_panel()
@@ -6,53 +6,57 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils import load_data, process_data, sidebar_filters
+from utils import load_data, process_data, sidebar_filters, filter_table, pin_generation
+from figures import cached_figure, filter_key, plotly_chart
+from distributions import box_stats, box_figure
+from profiling import start_rerun, span, profiling_panel
+from warmup import start_background_refresh
+from search import load_athlete_search_index
+from graph import load_relation_graph
 
 st.set_page_config(page_title="Athlete Performance", page_icon="👤", layout="wide")
+start_background_refresh()
+generation = pin_generation()
+start_rerun('Athlete Performance')
 
 # Load Data
-data = load_data()
+data = load_data(columns={
+    'athletes': ['code', 'name', 'country', 'disciplines', 'gender', 'height', 'weight', 'age', 'birth_date'],
+    'events': ['sport'],
+    'medallists': ['code_athlete', 'name', 'country', 'discipline', 'is_medallist'],
+    'nocs': ['country'],
+})
 data = process_data(data)
 
 # Sidebar Filters
-selected_continent, selected_countries, selected_sports, selected_medal_types = sidebar_filters(data)
-
-def get_filtered_countries(data, selected_continent, selected_countries):
-    if selected_countries:
-        return selected_countries
-    if selected_continent and 'nocs' in data:
-        return data['nocs'][data['nocs']['Continent'].isin(selected_continent)]['country'].unique().tolist()
-    return []
-
-effective_countries = get_filtered_countries(data, selected_continent, selected_countries)
+filters = sidebar_filters(data)
+selected_continent, selected_countries, selected_sports, selected_medal_types = filters
 
 st.title("👤 Athlete Performance")
 
 athletes_df = data.get('athletes', pd.DataFrame())
-coaches_df = data.get('coaches', pd.DataFrame())
-medals_df = data.get('medals', pd.DataFrame()) 
+medallists_df = data.get('medallists', pd.DataFrame())
 nocs_df = data.get('nocs', pd.DataFrame())
 
-if not athletes_df.empty:
-
-    filtered_athletes = athletes_df.copy()
-    
-    filtered_athletes['sport'] = filtered_athletes['disciplines'].astype(str).str.replace(r"[\[\]']", "", regex=True)
-
-    if effective_countries:
-        filtered_athletes = filtered_athletes[filtered_athletes['country'].isin(effective_countries)]
-    if selected_sports:
-        filtered_athletes = filtered_athletes[filtered_athletes['sport'].isin(selected_sports)]
-
-    # 1. Athlete Detailed Profile Card
-    st.subheader("Athlete Profile")
-    
+# Searching or picking an athlete reruns only this section
+@st.fragment
+def profile_section(generation, filtered_athletes):
+    pin_generation(generation)
     # Search box
-    athlete_names = sorted(filtered_athletes['name'].unique()) if 'name' in filtered_athletes.columns else []
-    selected_athlete_name = st.selectbox("Search and Select an Athlete", ["Select an Athlete"] + athlete_names)
-
-    if selected_athlete_name != "Select an Athlete":
-        athlete_info = filtered_athletes[filtered_athletes['name'] == selected_athlete_name].iloc[0]
+    search_index = load_athlete_search_index()
+    query = st.text_input("Search for an Athlete", placeholder="e.g. Remco EVENEPOEL")
+    with span('athlete_search'):
+        matches = search_index.search(query, k=10, allowed=filtered_athletes.index) if query else []
+    match_names = dict((row, name) for row, name, _ in matches)
+    if query and not matches:
+        st.info("No athlete matches your search.")
+
+    selected_athlete_row = st.selectbox("Select an Athlete", [None] + list(match_names),
+                                        format_func=lambda row: "Select an Athlete" if row is None else match_names[row])
+
+    if selected_athlete_row is not None:
+        athlete_info = filtered_athletes.loc[selected_athlete_row]
+        selected_athlete_name = athlete_info['name']
         
         col1, col2 = st.columns([1, 3])
         
@@ -66,87 +70,156 @@ if not athletes_df.empty:
             st.write(f"**Sport:** {athlete_info.get('sport', 'N/A')}")
             st.write(f"**Discipline:** {athlete_info.get('disciplines', 'N/A')}")
             
-            height = athlete_info.get('height', 0)
-            weight = athlete_info.get('weight', 0)
-            st.write(f"**Height:** {height if height > 0 else 'N/A'}")
-            st.write(f"**Weight:** {weight if weight > 0 else 'N/A'}")
+            # Nullable integers: missing values are pd.NA, and 0 also means not recorded
+            height = athlete_info.get('height', pd.NA)
+            weight = athlete_info.get('weight', pd.NA)
+            st.write(f"**Height:** {height if pd.notna(height) and height > 0 else 'N/A'}")
+            st.write(f"**Weight:** {weight if pd.notna(weight) and weight > 0 else 'N/A'}")
             
-            coach = athlete_info.get('coach', 'N/A')
-            if pd.isna(coach) or coach == '':
-                coach = 'N/A'
-            st.write(f"**Coach:** {coach}")
-
-    st.divider()
-
-    # 2. Athlete Age Distribution
-    st.subheader("Athlete Age Distribution")
-    if 'age' in filtered_athletes.columns or 'birth_date' in filtered_athletes.columns:
-        # Calculate age if needed
-        if 'age' not in filtered_athletes.columns and 'birth_date' in filtered_athletes.columns:
-            filtered_athletes['birth_date'] = pd.to_datetime(filtered_athletes['birth_date'], errors='coerce')
-            filtered_athletes['age'] = 2024 - filtered_athletes['birth_date'].dt.year
-        
-        if 'age' in filtered_athletes.columns:
-            fig_age = px.box(filtered_athletes, x='sport', y='age', color='gender', 
-                             title="Age Distribution by Sport and Gender")
-            st.plotly_chart(fig_age, use_container_width=True)
-        else:
-            st.info("Age data not available.")
-    else:
-        st.info("Age data not available.")
-
-    # 3. Gender Distribution
-    st.subheader("Gender Distribution")
+            relations = load_relation_graph()
+            coach_ids, inferred = relations.coaches_of(athlete_info['code']) \
+                if relations is not None else ([], False)
+            coaches = relations.frame('coach', coach_ids) if relations is not None else pd.DataFrame(columns=['name'])
+            coach = ', '.join(coaches['name']) if not coaches.empty else 'N/A'
+            if inferred and not coaches.empty:
+                # No team entry links these coaches to the athlete, only their NOC and discipline
+                disciplines = relations.labels['discipline'][relations.step(coach_ids, 'coach', 'discipline')]
+                st.write(f"**National team coach(es) for {', '.join(disciplines)}:** {coach}")
+            else:
+                st.write(f"**Coach:** {coach}")
+
+        if relations is not None:
+            col_mates, col_shared = st.columns(2)
+            with col_mates:
+                st.markdown("**Teammates**")
+                teammates = relations.frame('athlete', relations.teammates(athlete_info['code']))
+                if not teammates.empty:
+                    st.dataframe(teammates[['name']], hide_index=True, use_container_width=True)
+                else:
+                    st.caption("No team entries for this athlete.")
+            with col_shared:
+                st.markdown("**Athletes Sharing a Coach**")
+                shared_ids, shared_inferred = relations.shared_coach(athlete_info['code'])
+                shared = relations.frame('athlete', shared_ids)
+                if shared_inferred and not shared.empty:
+                    st.caption("Through the national team coaches above, not a team entry.")
+                if not shared.empty:
+                    st.dataframe(shared[['name']], hide_index=True, use_container_width=True)
+                else:
+                    st.caption("No coach data for this athlete.")
+
+
+# The view mode and continent/country selectors rerun only this section
+@st.fragment
+def gender_section(generation, filtered_athletes, nocs_df, athlete_key):
+    pin_generation(generation)
     view_mode = st.radio("View Gender Distribution By:", ["World", "Continent", "Country"])
     
     gender_df = filtered_athletes.copy()
+    gender_selection = None
     
     if view_mode == "Continent":
         if not nocs_df.empty:
              if 'country' in gender_df.columns and 'country' in nocs_df.columns:
-                gender_df = pd.merge(gender_df, nocs_df[['country', 'Continent']], on='country', how='left')
+                with span('continent_merge'):
+                    gender_df = pd.merge(gender_df, nocs_df[['country', 'Continent']], on='country', how='left')
              
              selected_cont = st.selectbox("Select Continent", gender_df['Continent'].dropna().unique())
              gender_df = gender_df[gender_df['Continent'] == selected_cont]
+             gender_selection = selected_cont
         else:
             st.warning("Continent data not available.")
 
     elif view_mode == "Country":
         selected_ctry = st.selectbox("Select Country", gender_df['country'].unique())
         gender_df = gender_df[gender_df['country'] == selected_ctry]
+        gender_selection = selected_ctry
 
-    if not gender_df.empty and 'gender' in gender_df.columns:
+    def build_gender_pie():
         gender_counts = gender_df['gender'].value_counts().reset_index()
         gender_counts.columns = ['Gender', 'Count']
-        fig_gender = px.pie(gender_counts, values='Count', names='Gender', title=f"Gender Distribution ({view_mode})")
-        st.plotly_chart(fig_gender, use_container_width=True)
+        # Categorical columns also report categories with no rows
+        gender_counts = gender_counts[gender_counts['Count'] > 0]
+        return px.pie(gender_counts, values='Count', names='Gender', title=f"Gender Distribution ({view_mode})")
+
+    if not gender_df.empty and 'gender' in gender_df.columns:
+        fig_gender = cached_figure('athlete_gender_pie', (athlete_key, view_mode, str(gender_selection)),
+                                   build_gender_pie)
+        plotly_chart(fig_gender, use_container_width=True)
     else:
         st.info("No gender data available for selection.")
 
+
+if not athletes_df.empty:
+
+    filtered_athletes = filter_table(athletes_df, 'athletes', filters, ('country', 'sport'))
+    
+    with span('sport_labels'):
+        filtered_athletes['sport'] = filtered_athletes['disciplines'].astype(str).str.replace(r"[\[\]']", "", regex=True)
+    athlete_key = filter_key(filters, ('country', 'sport'))
+
+    # 1. Athlete Detailed Profile Card
+    st.subheader("Athlete Profile")
+    
+    profile_section(generation, filtered_athletes)
+
+    st.divider()
+
+    # 2. Athlete Age Distribution
+    st.subheader("Athlete Age Distribution")
+    if 'age' in filtered_athletes.columns or 'birth_date' in filtered_athletes.columns:
+        # Calculate age if needed
+        if 'age' not in filtered_athletes.columns and 'birth_date' in filtered_athletes.columns:
+            filtered_athletes['birth_date'] = pd.to_datetime(filtered_athletes['birth_date'], errors='coerce')
+            filtered_athletes['age'] = 2024 - filtered_athletes['birth_date'].dt.year
+        
+        if 'age' in filtered_athletes.columns:
+            # Quartiles, whiskers and outliers are computed here; the figure carries one box per group
+            fig_age = cached_figure('athlete_age_box', athlete_key,
+                                    lambda: box_figure(box_stats(filtered_athletes, 'age', ['sport', 'gender']),
+                                                       x='sport', color='gender', value='age',
+                                                       title="Age Distribution by Sport and Gender"))
+            plotly_chart(fig_age, use_container_width=True)
+        else:
+            st.info("Age data not available.")
+    else:
+        st.info("Age data not available.")
+
+    # 3. Gender Distribution
+    st.subheader("Gender Distribution")
+    gender_section(generation, filtered_athletes, nocs_df, athlete_key)
+
     # 4. Top Athletes by Medals
     st.subheader("Top 10 Athletes by Medal Count")
-    if not medals_df.empty:
-        filtered_medals = medals_df.copy()
+    def build_top_athletes():
+        filtered_medals = filter_table(medallists_df, 'medallists', filters, ('country', 'sport'))
+        if 'is_medallist' in filtered_medals.columns:
+            # Team entries also list members who did not win the medal
+            filtered_medals = filtered_medals[filtered_medals['is_medallist'].astype(bool)]
+        if filtered_medals.empty:
+            return None
+
+        # Count medals per athlete code, team medals included; two athletes can share a name
+        medal_counts = filtered_medals['code_athlete'].value_counts()
+        medal_counts = medal_counts[medal_counts > 0].head(10)
+        names = filtered_medals.drop_duplicates('code_athlete').set_index('code_athlete')['name']
+        top_athletes = pd.DataFrame({'code': medal_counts.index.astype(str),
+                                     'name': names.reindex(medal_counts.index).to_numpy(),
+                                     'Medal Count': medal_counts.to_numpy()})
         
-        if effective_countries:
-            if 'country' in filtered_medals.columns:
-                filtered_medals = filtered_medals[filtered_medals['country'].isin(effective_countries)]
+        fig_top_ath = px.bar(top_athletes, x='Medal Count', y='code', orientation='h',
+                             hover_name='name', title="Top 10 Athletes by Total Medals")
+        # Codes are digits: without a category axis Plotly would place the bars on a number line
+        fig_top_ath.update_yaxes(type='category', tickmode='array', tickvals=top_athletes['code'],
+                                 ticktext=top_athletes['name'], title='name')
+        fig_top_ath.update_layout(yaxis={'categoryorder':'total ascending'})
+        return fig_top_ath
+
+    if not medallists_df.empty:
+        fig_top_ath = cached_figure('athlete_top_10', athlete_key, build_top_athletes)
         
-        if selected_sports:
-            if 'discipline' in filtered_medals.columns:
-                filtered_medals = filtered_medals[filtered_medals['discipline'].isin(selected_sports)]
-        
-        if not filtered_medals.empty:
-            # Count medals per athlete
-            athlete_medals = filtered_medals['name'].value_counts().reset_index()
-            athlete_medals.columns = ['name', 'Medal Count']
-            
-            top_athletes = athlete_medals.head(10)
-            
-            fig_top_ath = px.bar(top_athletes, x='Medal Count', y='name', orientation='h',
-                                 title="Top 10 Athletes by Total Medals")
-            fig_top_ath.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig_top_ath, use_container_width=True)
+        if fig_top_ath is not None:
+            plotly_chart(fig_top_ath, use_container_width=True)
         else:
             st.info("No medals found for the current selection.")
     else:
@@ -154,3 +227,5 @@ if not athletes_df.empty:
 
 else:
     st.error("Athletes data not found.")
+
+profiling_panel()
@@ -7,76 +7,131 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils import load_data, process_data, sidebar_filters
+from utils import load_data, process_data, sidebar_filters, filter_mask, TIMEZONE, pin_generation
+from engine import query_engine
+from figures import cached_figure, filter_key, plotly_chart
+from profiling import start_rerun, span, profiling_panel
+from warmup import start_background_refresh
+from schedule import load_schedule, schedule_days, schedule_view, load_session_index, venue_utilization
 
 st.set_page_config(page_title="Sports and Events", page_icon="🏟️", layout="wide")
+start_background_refresh()
+generation = pin_generation()
+start_rerun('Sports and Events')
 
 # Load Data
-data = load_data()
+data = load_data(columns={
+    'events': ['sport'],
+    'nocs': ['country'],
+    'venues': ['venue', 'sports', 'date_start', 'date_end', 'url', 'latitude', 'longitude', 'lat', 'lon'],
+})
 data = process_data(data)
 
 # Sidebar Filters
-selected_continent, selected_countries, selected_sports, selected_medal_types = sidebar_filters(data)
-
-def get_filtered_countries(data, selected_continent, selected_countries):
-    if selected_countries:
-        return selected_countries
-    if selected_continent and 'nocs' in data:
-        return data['nocs'][data['nocs']['Continent'].isin(selected_continent)]['country'].unique().tolist()
-    return []
-
-effective_countries = get_filtered_countries(data, selected_continent, selected_countries)
+filters = sidebar_filters(data)
+selected_continent, selected_countries, selected_sports, selected_medal_types = filters
 
 st.title("🏟️ Sports and Events")
 
-schedule_df = data.get('schedules', pd.DataFrame())
-events_df = data.get('events', pd.DataFrame())
 venues_df = data.get('venues', pd.DataFrame())
-medals_df = data.get('medals', pd.DataFrame())
-
-# 1. Event Schedule (Gantt Chart)
-st.subheader("Event Schedule")
-if not schedule_df.empty:
-
-    sched_viz = schedule_df.copy()
-    if selected_sports:
-        sched_viz = sched_viz[sched_viz['discipline'].isin(selected_sports)]
 
-    date_col = 'start_date'
-
-        
-    if date_col:
-        sched_viz[date_col] = pd.to_datetime(sched_viz[date_col])
-
-        if 'end_date' not in sched_viz.columns:
-            sched_viz['end_date'] = sched_viz[date_col] + pd.Timedelta(hours=2)
+# The schedule window drives both the Gantt chart and the venue utilization, so the slider
+# and the grouping radio rerun just those two
+@st.fragment
+def schedule_section(generation, filters, first_day, last_day, has_sessions):
+    pin_generation(generation)
+    window = st.slider("Schedule window", min_value=first_day, max_value=last_day,
+                       value=(first_day, last_day), format="MMM D")
+    group_by = st.radio("Group sessions by", ["Discipline", "Venue"], horizontal=True)
+    y_col = group_by.lower()
+
+    with span('schedule_view'):
+        sched_viz, level = schedule_view(filters, window[0], window[1], y_col)
+
+    if not sched_viz.empty:
+        if level == 'day':
+            st.caption("Zoomed out: each bar spans one day of sessions. Narrow the window to see individual sessions.")
+            hover_data = ['sessions']
         else:
-            sched_viz['end_date'] = pd.to_datetime(sched_viz['end_date'])
-            
+            hover_data = [c for c in ['event', 'phase', 'status'] if c in sched_viz.columns]
 
-        y_col = 'discipline' 
-        
-        fig_gantt = px.timeline(sched_viz, x_start=date_col, x_end='end_date', y=y_col, color=y_col,
-                                title="Event Schedule")
-        st.plotly_chart(fig_gantt, use_container_width=True)
+        fig_gantt = cached_figure('events_gantt', (filter_key(filters, ('sport',)), window, y_col),
+                                  lambda: px.timeline(sched_viz, x_start='start_date', x_end='end_date', y=y_col,
+                                                      color=y_col, hover_data=hover_data, title="Event Schedule"))
+        plotly_chart(fig_gantt, use_container_width=True)
+    else:
+        st.info("No sessions in the selected window.")
+
+    if not has_sessions:
+        return
+    st.subheader("Venue Utilization")
+    def build_utilization():
+        utilization = venue_utilization(window[0], window[1])
+        if utilization.empty:
+            return None
+        fig_util = px.bar(utilization, x='Utilization', y='Venue', orientation='h', hover_data=['Busy Hours'],
+                          title="Share of the Schedule Window with a Session Running")
+        fig_util.update_layout(yaxis={'categoryorder': 'total ascending'}, xaxis_tickformat='.0%')
+        return fig_util
+
+    fig_util = cached_figure('events_venue_utilization', window, build_utilization)
+    if fig_util is not None:
+        plotly_chart(fig_util, use_container_width=True)
     else:
-        st.warning("Date columns not found in schedule data.")
+        st.info("No venue activity in the selected window.")
+
+# Picking a day or time reruns only this section
+@st.fragment
+def whats_on_section(generation, session_index, filters, first_day, last_day):
+    pin_generation(generation)
+    col_day, col_time = st.columns(2)
+    now = pd.Timestamp.now(tz=TIMEZONE)
+    default_day = min(max(now.date(), first_day), last_day)
+    on_day = col_day.date_input("Day", value=default_day, min_value=first_day, max_value=last_day)
+    on_time = col_time.time_input("Time", value=now.time().replace(second=0, microsecond=0))
+    moment = pd.Timestamp.combine(on_day, on_time).tz_localize(TIMEZONE)
+
+    with span('sessions_at'):
+        running = session_index.at(moment, filter_mask('schedules', filters, ('sport',)))
+
+    if not running.empty:
+        st.dataframe(running[[c for c in ['discipline', 'event', 'phase', 'venue', 'start_date', 'end_date', 'status']
+                              if c in running.columns]], use_container_width=True, hide_index=True)
+    else:
+        st.info("No sessions running at the selected time.")
+
+# 1. Event Schedule (Gantt Chart)
+st.subheader("Event Schedule")
+session_index, _ = load_session_index()
+has_sessions = session_index is not None and len(session_index) > 0
+if not load_schedule().empty:
+    first_day, last_day = schedule_days()
+    schedule_section(generation, filters, first_day, last_day, has_sessions)
+else:
+    st.info("Schedule data not available.")
+
+st.subheader("What's On")
+if has_sessions:
+    whats_on_section(generation, session_index, filters, first_day, last_day)
 else:
     st.info("Schedule data not available.")
 
 st.subheader("Medal Count by Sport")
-if not medals_df.empty:
+engine = query_engine()
 
-    medals_viz = medals_df.copy()
-    if effective_countries:
-        medals_viz = medals_viz[medals_viz['country'].isin(effective_countries)]
-            
-    sport_medals = medals_viz['discipline'].value_counts().reset_index()
+def build_sport_treemap():
+    sport_medals = engine.medal_counts(filters, ('discipline',), ('country',))
     sport_medals.columns = ['Sport', 'Count']
+    if sport_medals.empty:
+        return None
+    return px.treemap(sport_medals, path=['Sport'], values='Count', title="Medals by Sport")
+
+if engine.has_medals():
+
+    fig_tree = cached_figure('events_sport_treemap', filter_key(filters, ('country',)), build_sport_treemap)
     
-    if not sport_medals.empty:
-        fig_tree = px.treemap(sport_medals, path=['Sport'], values='Count', title="Medals by Sport")
-        st.plotly_chart(fig_tree, use_container_width=True)
+    if fig_tree is not None:
+        plotly_chart(fig_tree, use_container_width=True)
     else:
         st.info("No medals data available for the current selection.")
 else:
@@ -144,11 +199,15 @@ if not venues_df.empty:
 
             hover_data = [col for col in hover_cols if col in venues_map.columns]
 
-            fig_map = px.scatter_mapbox(venues_map, lat=lat_col, lon=lon_col, hover_name='venue',
-                                        hover_data=hover_data,
-                                        zoom=4, height=500) 
-            fig_map.update_layout(mapbox_style="open-street-map")
-            st.plotly_chart(fig_map, use_container_width=True)
+            def build_venue_map():
+                fig_map = px.scatter_mapbox(venues_map, lat=lat_col, lon=lon_col, hover_name='venue',
+                                            hover_data=hover_data,
+                                            zoom=4, height=500) 
+                fig_map.update_layout(mapbox_style="open-street-map")
+                return fig_map
+
+            fig_map = cached_figure('events_venue_map', (), build_venue_map)
+            plotly_chart(fig_map, use_container_width=True)
         else:
              st.warning("Could not map venues to coordinates.")
              st.dataframe(venues_df[['venue', 'sports', 'date_start', 'date_end', 'url']], use_container_width=True)
@@ -157,3 +216,5 @@ if not venues_df.empty:
         st.dataframe(venues_df[['venue', 'sports', 'date_start', 'date_end', 'url']], use_container_width=True)
 else:
     st.info("Venues data not available.")
+
+profiling_panel()
@@ -0,0 +1,170 @@
+import streamlit as st
+import pandas as pd
+import os
+import json
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Off unless set: '1' records span timings, 'alloc' also the net Python allocations of each span
+PROFILING = os.environ.get('PROFILING', '').lower()
+# File every profiled rerun is appended to, one JSON object per line
+PROFILE_LOG = os.environ.get('PROFILE_LOG', '')
+# Reruns kept per session for the panel's download
+SESSION_TRACES = 20
+# Span attributes are cut to this many characters
+ATTR_LENGTH = 120
+
+_local = threading.local()
+_log_lock = threading.Lock()
+_counter_lock = threading.Lock()
+# Process-wide cache hit/miss counts, by cache name, since start-up
+cache_totals = {'hit': Counter(), 'miss': Counter()}
+
+
+def enabled():
+    """Whether this rerun is profiled: PROFILING or PROFILE_LOG is set, or the URL has ``?profile``."""
+    if PROFILING or PROFILE_LOG:
+        return True
+    try:
+        return 'profile' in st.query_params
+    except Exception:
+        # Outside a script run there are no query parameters
+        return False
+
+
+class Trace:
+    """The span tree and cache counts of one rerun of one page."""
+
+    def __init__(self, page, allocations=False):
+        self.page = page
+        self.allocations = allocations
+        self.started_at = time.time()
+        self.root = {'name': page, 'ms': None, 'children': []}
+        self.stack = [self.root]
+        self.start = time.perf_counter()
+        self.caches = {'hit': Counter(), 'miss': Counter()}
+
+    def finish(self):
+        self.root['ms'] = round((time.perf_counter() - self.start) * 1000, 3)
+
+    def to_dict(self):
+        return {'page': self.page, 'started_at': self.started_at, 'ms': self.root['ms'],
+                'spans': self.root['children'],
+                'caches': {kind: dict(counts) for kind, counts in self.caches.items()}}
+
+
+def current_trace():
+    """The trace of the rerun running on this thread, if it is profiled."""
+    return getattr(_local, 'trace', None)
+
+
+def start_rerun(page):
+    """Starts profiling this rerun of ``page``, if profiling is enabled; call at the top of the page."""
+    if not enabled():
+        _local.trace = None
+        return
+    allocations = PROFILING == 'alloc'
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _local.trace = Trace(page, allocations)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Times the enclosed block as a child of the innermost open span of this rerun.
+
+    Costs one attribute lookup when the rerun is not profiled. Allocations are the net
+    growth of the traced Python heap, which also counts other threads running meanwhile.
+    """
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+    node = {'name': name, 'ms': None, 'children': []}
+    if attrs:
+        node['attrs'] = {key: str(value)[:ATTR_LENGTH] for key, value in attrs.items()}
+    trace.stack[-1]['children'].append(node)
+    trace.stack.append(node)
+    allocated = tracemalloc.get_traced_memory()[0] if trace.allocations else 0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        node['ms'] = round((time.perf_counter() - start) * 1000, 3)
+        if trace.allocations:
+            node['alloc_kb'] = round((tracemalloc.get_traced_memory()[0] - allocated) / 1024, 1)
+        trace.stack.pop()
+
+
+def count_cache(name, hit):
+    """Counts a hit or miss of cache ``name``, process-wide and in this rerun's trace."""
+    kind = 'hit' if hit else 'miss'
+    with _counter_lock:
+        cache_totals[kind][name] += 1
+    trace = current_trace()
+    if trace is not None:
+        trace.caches[kind][name] += 1
+
+
+def export(record):
+    """Appends one rerun to PROFILE_LOG as a JSON line."""
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        with open(PROFILE_LOG, 'a') as f:
+            f.write(line + '\n')
+
+
+# Leading spaces are trimmed in st.dataframe cells; em spaces are not
+INDENT = '\u2003'
+
+
+def flatten(spans, depth=0):
+    """Rows of (indented name, ms, allocations, attributes), depth first."""
+    rows = []
+    for node in spans:
+        rows.append({'span': INDENT * depth + node['name'], 'ms': node['ms'], 'alloc_kb': node.get('alloc_kb'),
+                     'attrs': ', '.join(f'{k}={v}' for k, v in node.get('attrs', {}).items())})
+        rows.extend(flatten(node['children'], depth + 1))
+    return rows
+
+
+def cache_table(caches):
+    names = sorted(set(caches['hit']) | set(caches['miss']))
+    return pd.DataFrame({'cache': names, 'hits': [caches['hit'][n] for n in names],
+                         'misses': [caches['miss'][n] for n in names]})
+
+
+def profiling_panel():
+    """Ends this rerun's trace: exports it and shows it in a sidebar expander; call at the end of the page."""
+    trace = current_trace()
+    if trace is None:
+        return
+    _local.trace = None
+    trace.finish()
+    record = trace.to_dict()
+    if PROFILE_LOG:
+        export(record)
+
+    traces = st.session_state.setdefault('profiling_traces', [])
+    traces.append(record)
+    del traces[:-SESSION_TRACES]
+
+    with st.sidebar.expander(f"Profiling: {record['ms']:.0f} ms", expanded=False):
+        rows = pd.DataFrame(flatten(record['spans']))
+        if trace.allocations:
+            st.caption("Allocations are the net growth of the Python heap, all threads included.")
+        elif not rows.empty:
+            rows = rows.drop(columns='alloc_kb')
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.markdown("**Caches, this rerun**")
+        st.dataframe(cache_table(trace.caches), hide_index=True, use_container_width=True)
+        st.markdown("**Caches, since start-up**")
+        with _counter_lock:
+            totals = cache_table(cache_totals)
+        st.dataframe(totals, hide_index=True, use_container_width=True)
+        st.download_button("Download reruns (JSON lines)",
+                           '\n'.join(json.dumps(t, default=str) for t in traces),
+                           file_name='profile.jsonl', mime='application/x-ndjson')
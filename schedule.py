@@ -0,0 +1,169 @@
+import pandas as pd
+import numpy as np
+
+from utils import generation_cache, load_table, filter_mask, artifact_path, TIMEZONE
+
+SCHEDULE_COLUMNS = ('start_date', 'end_date', 'day', 'status', 'discipline', 'event', 'phase', 'venue')
+
+# Above this many sessions in the window the timeline shows one bar per (group, day)
+MAX_TIMELINE_SESSIONS = 400
+DEFAULT_SESSION_LENGTH = pd.Timedelta(hours=2)
+
+
+@generation_cache
+def load_schedule():
+    """Schedule sessions with parsed timestamps; a missing end defaults to start + 2 hours.
+
+    Shared by every session, like utils.shared_table; callers must not modify it in place.
+    """
+    path = artifact_path('schedule.parquet')
+    if path is not None:
+        return pd.read_parquet(path)
+    schedule = load_table('schedules', SCHEDULE_COLUMNS)
+    if schedule.empty or 'start_date' not in schedule.columns:
+        return pd.DataFrame()
+    if 'end_date' not in schedule.columns:
+        schedule['end_date'] = pd.NaT
+    schedule['end_date'] = schedule['end_date'].fillna(schedule['start_date'] + DEFAULT_SESSION_LENGTH)
+    return schedule
+
+
+def schedule_days():
+    """First and last calendar day of the schedule, as ``datetime.date``."""
+    schedule = load_schedule()
+    return schedule['start_date'].min().date(), schedule['end_date'].max().date()
+
+
+def window_bounds(first_day, last_day):
+    """Timestamps covering the calendar days ``first_day`` to ``last_day`` inclusive."""
+    start = pd.Timestamp(first_day).tz_localize(TIMEZONE)
+    end = pd.Timestamp(last_day).tz_localize(TIMEZONE) + pd.Timedelta(days=1)
+    return start, end
+
+
+@generation_cache(max_entries=64)
+def schedule_view(spec, first_day, last_day, group_by='discipline'):
+    """Timeline rows for the sessions overlapping the window, at a bounded level of detail.
+
+    Returns ``(frame, level)``. When at most MAX_TIMELINE_SESSIONS sessions fall in the window
+    the level is 'session' and each row is one session; otherwise it is 'day' and each row
+    spans the first start to the last end of one (``group_by``, day) with a ``sessions`` count.
+    """
+    schedule = load_schedule()
+    if schedule.empty:
+        return schedule, 'session'
+
+    mask = filter_mask('schedules', spec, ('sport',))
+    if mask is not None:
+        schedule = schedule[mask]
+
+    start, end = window_bounds(first_day, last_day)
+    sessions = schedule[(schedule['start_date'] < end) & (schedule['end_date'] > start)]
+    sessions = sessions.dropna(subset=[group_by])
+
+    if len(sessions) <= MAX_TIMELINE_SESSIONS:
+        return sessions, 'session'
+
+    day = sessions['start_date'].dt.normalize().rename('day')
+    grouped = sessions.groupby([sessions[group_by], day], observed=True)
+    summary = grouped.agg(start_date=('start_date', 'min'), end_date=('end_date', 'max'),
+                          sessions=('start_date', 'size')).reset_index()
+    return summary, 'day'
+
+
+# Table -> (start column, end column, venue column) for the session indexes
+SESSION_SOURCES = {
+    'schedules': ('start_date', 'end_date', 'venue'),
+    'schedules_preliminary': ('date_start_utc', 'date_end_utc', 'description'),
+}
+
+
+def to_epoch_ns(values):
+    """int64 UTC nanoseconds for a tz-aware Series or a single timestamp."""
+    if isinstance(values, pd.Series):
+        return values.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy('datetime64[ns]').view('int64')
+    return pd.Timestamp(values).tz_convert('UTC').value
+
+
+class SessionIndex:
+    """Sessions sorted by start time, answering overlap queries by binary search.
+
+    A session overlapping ``[start, end)`` must start in ``[start - max_duration, end)``,
+    so two ``searchsorted`` calls bound the candidates and only those have their end
+    checked: O(log n + k) where k is the number of sessions in that range.
+    """
+
+    def __init__(self, sessions, start_col, end_col):
+        sessions = sessions.dropna(subset=[start_col, end_col])
+        order = np.argsort(to_epoch_ns(sessions[start_col]), kind='stable')
+        # Each session's row in its source table, where the filter masks (utils.filter_mask) apply
+        self.rows = sessions.index.to_numpy()[order]
+        self.sessions = sessions.iloc[order].reset_index(drop=True)
+        self.starts = to_epoch_ns(self.sessions[start_col])
+        self.ends = to_epoch_ns(self.sessions[end_col])
+        self.max_duration = int((self.ends - self.starts).max()) if len(self.starts) else 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def positions(self, start, end):
+        """Positions of the sessions overlapping ``[start, end)``, given as epoch nanoseconds."""
+        lo = np.searchsorted(self.starts, start - self.max_duration, side='left')
+        hi = np.searchsorted(self.starts, end, side='left')
+        return lo + np.flatnonzero(self.ends[lo:hi] > start)
+
+    def overlapping(self, start, end):
+        """Sessions overlapping the window ``[start, end)``."""
+        return self.sessions.iloc[self.positions(to_epoch_ns(start), to_epoch_ns(end))]
+
+    def at(self, moment, mask=None):
+        """Sessions running at ``moment``: started at or before it and not yet ended.
+
+        ``mask`` optionally keeps only the sessions whose source row it selects.
+        """
+        t = to_epoch_ns(moment)
+        positions = self.positions(t, t + 1)
+        if mask is not None:
+            positions = positions[mask[self.rows[positions]]]
+        return self.sessions.iloc[positions]
+
+    def busy_ns(self, start, end):
+        """Time within ``[start, end)`` covered by at least one session, in nanoseconds."""
+        positions = self.positions(start, end)
+        busy, covered_until = 0, start
+        for s, e in zip(np.maximum(self.starts[positions], start), np.minimum(self.ends[positions], end)):
+            if e <= covered_until:
+                continue
+            busy += e - max(s, covered_until)
+            covered_until = e
+        return busy
+
+
+@generation_cache
+def load_session_index(name='schedules'):
+    """Session index over a whole schedule table plus one per venue: ``(index, {venue: index})``."""
+    start_col, end_col, venue_col = SESSION_SOURCES[name]
+    # Prebuilt sessions are already in start order, so sorting them again is a linear pass
+    path = artifact_path('sessions', name + '.parquet')
+    if path is not None:
+        sessions = pd.read_parquet(path).set_index('row')
+    else:
+        sessions = load_schedule() if name == 'schedules' else load_table(name)
+    if sessions.empty or start_col not in sessions.columns or end_col not in sessions.columns:
+        return None, {}
+
+    by_venue = {}
+    if venue_col in sessions.columns:
+        for venue, group in sessions.groupby(venue_col, observed=True):
+            by_venue[venue] = SessionIndex(group, start_col, end_col)
+    return SessionIndex(sessions, start_col, end_col), by_venue
+
+
+def venue_utilization(first_day, last_day, name='schedules'):
+    """Share of the window each venue has at least one session running, highest first."""
+    _, by_venue = load_session_index(name)
+    start, end = (to_epoch_ns(t) for t in window_bounds(first_day, last_day))
+    rows = [(venue, index.busy_ns(start, end) / 3.6e12) for venue, index in by_venue.items()]
+    utilization = pd.DataFrame(rows, columns=['Venue', 'Busy Hours'])
+    utilization['Utilization'] = utilization['Busy Hours'] / ((end - start) / 3.6e12)
+    return utilization[utilization['Busy Hours'] > 0].sort_values('Utilization', ascending=False)
@@ -0,0 +1,127 @@
+import pandas as pd
+import numpy as np
+import re
+import unicodedata
+from collections import defaultdict
+
+from utils import generation_cache, previous_result, load_table
+
+MIN_FUZZY_SCORE = 0.3
+
+
+# Lower-case letters with no ASCII decomposition under NFKD, which would otherwise be stripped
+TRANSLITERATION = str.maketrans({
+    'ø': 'o', 'ł': 'l', 'ß': 'ss', 'æ': 'ae', 'œ': 'oe', 'đ': 'd', 'ð': 'd', 'þ': 'th',
+    'ı': 'i', 'ħ': 'h', 'ŀ': 'l', 'ŧ': 't', 'ŋ': 'n', 'ĸ': 'k',
+})
+
+
+def normalize(text):
+    """Lower-cases, strips accents and punctuation: "Léon MARCHAND" -> "leon marchand".
+
+    Letters such as Ø, Ł, Æ and Đ are transliterated ("Øyvind" -> "oyvind"), not dropped.
+    """
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r'[^0-9a-z]+', ' ', text.casefold().translate(TRANSLITERATION)).strip()
+
+
+def trigrams(tokens):
+    """Set of padded character trigrams over ``tokens``; independent of token order."""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class AthleteSearchIndex:
+    """Token-prefix and trigram index over athlete names, keyed by row label and athlete code.
+
+    Names are matched as bags of tokens, so "Remco EVENEPOEL" and "EVENEPOEL Remco" find the
+    same athlete. Prefix matches rank first; trigram similarity fills in typos and partial names.
+    """
+
+    def __init__(self, rows, codes, names):
+        self.rows = np.asarray(rows)
+        self.names = list(names)
+        self.by_code = dict(zip(codes, self.rows))
+
+        token_rows, token_keys = [], []
+        postings = defaultdict(list)
+        self.trigram_counts = np.zeros(len(self.rows), dtype=np.int32)
+        for position, name in enumerate(self.names):
+            tokens = normalize(name).split()
+            for token in set(tokens):
+                token_keys.append(token)
+                token_rows.append(position)
+            grams = trigrams(tokens)
+            self.trigram_counts[position] = len(grams)
+            for gram in grams:
+                postings[gram].append(position)
+
+        order = np.argsort(token_keys, kind='stable')
+        self.token_keys = np.asarray(token_keys, dtype=object)[order].astype(str)
+        self.token_positions = np.asarray(token_rows, dtype=np.int64)[order]
+        self.postings = {gram: np.asarray(p, dtype=np.int64) for gram, p in postings.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def prefix_positions(self, token):
+        lo = np.searchsorted(self.token_keys, token, side='left')
+        hi = np.searchsorted(self.token_keys, token + '\uffff', side='left')
+        return np.unique(self.token_positions[lo:hi])
+
+    def search(self, query, k=10, allowed=None):
+        """Top-``k`` matches for ``query`` as ``[(row, name, score)]``, best first.
+
+        Every query token must prefix some name token for a prefix match (score >= 1); other
+        names are scored by trigram Jaccard similarity. ``allowed`` restricts results to
+        those row labels.
+        """
+        tokens = normalize(query).split()
+        if not tokens:
+            return []
+
+        allowed_mask = None
+        if allowed is not None:
+            allowed_mask = np.isin(self.rows, np.asarray(allowed))
+
+        scores = np.zeros(len(self.rows))
+        prefix = self.prefix_positions(tokens[0])
+        for token in tokens[1:]:
+            prefix = np.intersect1d(prefix, self.prefix_positions(token), assume_unique=True)
+        # Shorter names are closer matches to the same prefixes
+        scores[prefix] = 1 + 1 / (1 + self.trigram_counts[prefix])
+
+        grams = trigrams(tokens)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if hits:
+            shared = np.bincount(np.concatenate(hits), minlength=len(self.rows))
+            jaccard = shared / (len(grams) + self.trigram_counts - shared)
+            fuzzy = (scores == 0) & (jaccard >= MIN_FUZZY_SCORE)
+            scores[fuzzy] = jaccard[fuzzy]
+
+        if allowed_mask is not None:
+            scores[~allowed_mask] = 0
+        candidates = np.flatnonzero(scores > 0)
+        best = candidates[np.argsort(-scores[candidates], kind='stable')[:k]]
+        return [(self.rows[p].item(), self.names[p], float(scores[p])) for p in best]
+
+    def row_for_code(self, code):
+        return self.by_code.get(code)
+
+
+@generation_cache
+def load_athlete_search_index():
+    """Builds the athlete search index once per data version, reusing it while athletes.csv is unchanged."""
+    index = previous_result(load_athlete_search_index.__wrapped__, (), ('athletes',))
+    if index is not None:
+        return index
+    athletes = load_table('athletes', ('code', 'name'))
+    if athletes.empty or 'name' not in athletes.columns:
+        return AthleteSearchIndex([], [], [])
+    athletes = athletes.dropna(subset=['name'])
+    codes = athletes['code'] if 'code' in athletes.columns else pd.Series(athletes.index)
+    return AthleteSearchIndex(athletes.index, codes, athletes['name'])
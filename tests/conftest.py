@@ -0,0 +1,45 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+# The modules under test live at the repository root, as the pages import them
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# utils reads these at import: tests load their own small tables, never data/ or its artifacts
+DATA_FOLDER = tempfile.mkdtemp(prefix='olympics-tests-')
+os.environ['DATA_FOLDER'] = DATA_FOLDER
+os.environ['ARTIFACT_FOLDER'] = ''
+
+
+def fresh_generation():
+    """Publishes an empty generation for the data folder, so nothing cached earlier is reused."""
+    from utils import Generation, data_version, publish_generation
+    generation = Generation(data_version())
+    publish_generation(generation)
+    return generation
+
+
+@pytest.fixture
+def tables():
+    """Writes ``{name: DataFrame}`` as the CSV tables of the data folder, replacing any others.
+
+    Returns the writer; each call starts a fresh generation over the new files.
+    """
+    def write(frames):
+        for file in os.listdir(DATA_FOLDER):
+            path = os.path.join(DATA_FOLDER, file)
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+        for name, frame in frames.items():
+            frame.to_csv(os.path.join(DATA_FOLDER, name + '.csv'), index=False)
+        return fresh_generation()
+    yield write
+    import utils
+    utils._local.generation = None
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_FOLDER, ignore_errors=True)
@@ -0,0 +1,76 @@
+import ast
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import explode_list_column, load_bridge, rows_with_any
+
+LISTS = pd.Series([
+    "['Judo']",
+    "['Judo', 'Wrestling']",
+    "[\"Men's 100m\", 'Relay']",
+    "['O\\'Neil', 'A, B']",
+    "[]",
+    np.nan,
+    "Swimming",
+    "",
+    "['  Padded  ']",
+], index=[10, 11, 12, 13, 14, 15, 16, 17, 18])
+
+
+def reference(series):
+    """One (row, item) pair per list item, parsed with literal_eval; plain strings are one item."""
+    pairs = []
+    for row, value in series.dropna().items():
+        value = str(value)
+        items = ast.literal_eval(value) if value.startswith('[') else [value]
+        pairs += [(row, str(item).strip()) for item in items if str(item).strip()]
+    return pairs
+
+
+def test_explode_matches_literal_eval():
+    bridge = explode_list_column(LISTS)
+    assert list(zip(bridge['row'], bridge['value'])) == reference(LISTS)
+
+
+def test_explode_keeps_row_order_and_empty_input():
+    shuffled = LISTS.iloc[::-1]
+    assert sorted(explode_list_column(shuffled)['row']) == explode_list_column(shuffled)['row'].tolist()
+    assert explode_list_column(pd.Series([], dtype=object)).empty
+
+
+TEAMS = pd.DataFrame({
+    'code': ['JUDO-FRA', 'HOC-ARG-W', 'HOC-ARG-M'],
+    'team': ['France', 'Argentina', 'Argentina'],
+    'country_code': ['FRA', 'ARG', 'ARG'],
+    'discipline': ['Judo', 'Hockey', 'Hockey'],
+    'athletes': ["['A', 'B']", "['C']", "['D', 'E']"],
+    'athletes_codes': ["['1', '2']", "['3']", "['4', 'x5']"],
+    'coaches_codes': ["['10']", "['11', '99']", "['12', '99']"],
+})
+
+
+def test_bridges_match_literal_eval(tables):
+    tables({'teams': TEAMS})
+    bridge = load_bridge('teams', 'athletes')
+    assert list(zip(bridge['row'], bridge['athletes'].astype(str))) == reference(TEAMS['athletes'])
+    codes = load_bridge('teams', 'athletes_codes')
+    # Codes are int32; items that are not numbers are dropped
+    assert codes['athletes_codes'].dtype == 'int32'
+    assert list(zip(codes['row'], codes['athletes_codes'])) == [(0, 1), (0, 2), (1, 3), (2, 4)]
+
+
+@pytest.mark.parametrize('values, expected', [
+    (['99'], [1, 2]),
+    (['10', '12'], [0, 2]),
+    (['nobody'], []),
+])
+def test_rows_with_any_is_a_semi_join(tables, values, expected):
+    tables({'teams': TEAMS.assign(coaches_codes=TEAMS['coaches_codes'].str.replace("'", '"'))})
+    bridge = load_bridge('teams', 'coaches_codes')
+    wanted = [int(v) for v in values if v.isdigit()]
+    assert sorted(rows_with_any('teams', 'coaches_codes', wanted)) == expected
+    reference_rows = [row for row, item in reference(TEAMS['coaches_codes']) if item in values]
+    assert sorted(set(reference_rows)) == expected
+    assert len(bridge) == 5
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import CUBE_AXES, build_medal_cube
+
+NOCS = pd.DataFrame({'code': ['FRA', 'GER', 'JPN', 'USA', 'KEN'],
+                     'Continent': ['Europe', 'Europe', 'Asia', 'North America', 'Africa']})
+NAMES = {'FRA': 'France', 'GER': 'Germany', 'JPN': 'Japan', 'USA': 'United States', 'KEN': 'Kenya'}
+
+
+def random_medals(seed, rows=300):
+    rng = np.random.default_rng(seed)
+    codes = rng.choice(list(NAMES), rows)
+    return pd.DataFrame({
+        'country_code': codes,
+        'country': [NAMES[c] for c in codes],
+        'discipline': rng.choice(['Judo', 'Swimming', 'Athletics', 'Rowing'], rows),
+        'medal_type': rng.choice(['Gold Medal', 'Silver Medal', 'Bronze Medal'], rows),
+        'gender': rng.choice(['M', 'W', 'X'], rows),
+        'medal_date': pd.to_datetime('2024-07-27') + pd.to_timedelta(rng.integers(0, 15, rows), unit='D'),
+    })
+
+
+def with_continent(medals):
+    return medals.assign(Continent=medals['country_code'].map(NOCS.set_index('code')['Continent']))
+
+
+def reference_counts(medals, dims):
+    counts = medals.groupby(list(dims)).size().rename('count').reset_index()
+    return counts.sort_values(list(dims), ignore_index=True)
+
+
+def as_sorted(frame, dims):
+    frame = frame.copy()
+    for d in dims:
+        frame[d] = frame[d].astype(str) if frame[d].dtype != 'datetime64[ns]' else frame[d]
+    return frame.sort_values(list(dims), ignore_index=True)
+
+
+@pytest.mark.parametrize('dims', [
+    ('medal_type',), ('country', 'medal_type'), ('Continent', 'discipline'),
+    ('country_code', 'gender', 'medal_date'), ('Continent', 'country', 'discipline'),
+])
+def test_rollup_matches_groupby(dims):
+    medals = random_medals(0)
+    cube = build_medal_cube(medals, NOCS)
+    expected = reference_counts(with_continent(medals), dims)
+    got = as_sorted(cube.rollup(*dims), dims)
+    expected = as_sorted(expected, dims)
+    pd.testing.assert_frame_equal(got[list(dims)], expected[list(dims)])
+    assert got['count'].tolist() == expected['count'].tolist()
+
+
+@pytest.mark.parametrize('selections', [
+    {'country': ['France', 'Japan']},
+    {'Continent': ['Europe'], 'medal_type': ['Gold Medal']},
+    {'discipline': ['Judo', 'Rowing'], 'gender': ['W']},
+    {'country': ['Atlantis']},
+    {'medal_type': []},
+    {'country': None, 'discipline': ['Swimming']},
+])
+def test_slice_matches_boolean_filter(selections):
+    medals = random_medals(1)
+    cube = build_medal_cube(medals, NOCS)
+    frame = with_continent(medals)
+    keep = pd.Series(True, index=frame.index)
+    for dim, labels in selections.items():
+        if labels is not None:
+            keep &= frame[dim].isin(labels)
+    sliced = cube.slice(**selections)
+    assert sliced.total() == int(keep.sum())
+    expected = reference_counts(frame[keep], ('country',))
+    got = as_sorted(sliced.rollup('country'), ('country',))
+    assert list(zip(got['country'], got['count'])) == list(zip(expected['country'], expected['count']))
+
+
+def test_top_k_matches_value_counts():
+    medals = random_medals(2)
+    cube = build_medal_cube(medals, NOCS)
+    top = cube.top_k('country', 3)
+    expected = medals['country'].value_counts()
+    assert top['count'].tolist() == expected.head(3).tolist()
+    assert set(top['country']) <= set(expected.index)
+
+
+def test_updated_equals_a_rebuild():
+    medals = random_medals(3)
+    cube = build_medal_cube(medals, NOCS)
+    added, removed = random_medals(4, rows=20), medals.iloc[[0, 5, 7]]
+    # Restrict additions to labels the cube's axes already hold
+    added = added[added['medal_date'].isin(medals['medal_date'])]
+    updated = cube.updated(added, removed)
+    rebuilt = build_medal_cube(pd.concat([medals.drop(removed.index), added]), NOCS)
+    dims = tuple(CUBE_AXES)
+    pd.testing.assert_frame_equal(as_sorted(updated.rollup(*dims), dims), as_sorted(rebuilt.rollup(*dims), dims))
+    assert cube.updated(added.iloc[:0], removed.iloc[:0]) is cube
+
+
+def test_updated_needs_a_rebuild_for_new_labels():
+    medals = random_medals(5)
+    cube = build_medal_cube(medals, NOCS)
+    new_noc = medals.iloc[[0]].assign(country_code='NZL', country='New Zealand')
+    assert cube.updated(new_noc, medals.iloc[:0]) is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    from cube import MedalCube
+    cube = build_medal_cube(random_medals(6), NOCS)
+    cube.save(tmp_path / 'cube.npz')
+    loaded = MedalCube.load(tmp_path / 'cube.npz')
+    assert np.array_equal(loaded.counts, cube.counts)
+    dims = ('Continent', 'country', 'medal_date')
+    pd.testing.assert_frame_equal(as_sorted(loaded.rollup(*dims), dims), as_sorted(cube.rollup(*dims), dims))
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from distributions import WHISKER_IQR, box_stats
+
+
+def sample(seed, rows=400):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'sport': rng.choice(['Judo', 'Rowing', 'Swimming'], rows),
+        'gender': rng.choice(['Female', 'Male'], rows),
+        'age': rng.normal(26, 4, rows).round(),
+    })
+    # A few extremes per group, and some missing values to ignore
+    df.loc[rng.choice(rows, 8, replace=False), 'age'] = rng.choice([12.0, 55.0, 61.0], 8)
+    df.loc[rng.choice(rows, 10, replace=False), 'age'] = np.nan
+    return df
+
+
+def reference(values):
+    """One group's statistics with numpy, for the values of that group."""
+    values = np.sort(values[~np.isnan(values)])
+    q1, median, q3 = np.percentile(values, [25, 50, 75], method='linear')
+    reach = WHISKER_IQR * (q3 - q1)
+    inside = (values >= q1 - reach) & (values <= q3 + reach)
+    return {'count': len(values), 'q1': q1, 'median': median, 'q3': q3,
+            'lowerfence': values[inside].min(), 'upperfence': values[inside].max(),
+            'outliers': sorted(values[~inside].tolist())}
+
+
+@pytest.mark.parametrize('by', [['sport'], ['sport', 'gender']])
+def test_matches_numpy_per_group(by):
+    df = sample(0)
+    stats = box_stats(df, 'age', by)
+    groups = df.groupby(by)
+    assert len(stats) == groups.ngroups
+    for _, row in stats.iterrows():
+        key = tuple(row[by])
+        expected = reference(groups.get_group(key)['age'].to_numpy())
+        assert row['count'] == expected['count']
+        for column in ('q1', 'median', 'q3', 'lowerfence', 'upperfence'):
+            assert row[column] == pytest.approx(expected[column])
+        assert sorted(row['outliers']) == expected['outliers']
+
+
+def test_groups_without_outliers_get_an_empty_list():
+    df = pd.DataFrame({'sport': ['Judo'] * 4 + ['Rowing'] * 5, 'age': [20, 21, 22, 23, 20, 21, 22, 23, 90]})
+    stats = box_stats(df, 'age', ['sport']).set_index('sport')
+    assert stats.loc['Judo', 'outliers'] == []
+    assert stats.loc['Rowing', 'outliers'] == [90]
+    assert stats.loc['Rowing', 'upperfence'] == 23
+
+
+def test_no_values_gives_no_groups():
+    df = pd.DataFrame({'sport': ['Judo', 'Rowing'], 'age': [np.nan, np.nan]})
+    stats = box_stats(df, 'age', ['sport'])
+    assert stats.empty
+    assert 'outliers' in stats.columns
+
+
+def test_unused_categories_are_left_out():
+    df = pd.DataFrame({'sport': pd.Categorical(['Judo', 'Judo'], categories=['Judo', 'Rowing']), 'age': [20, 30]})
+    assert box_stats(df, 'age', ['sport'])['sport'].tolist() == ['Judo']
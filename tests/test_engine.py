@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from test_filters import MEDALS, NOCS
+from utils import FilterSpec, pin_generation
+
+duckdb = pytest.importorskip('duckdb')
+import engine  # noqa: E402
+
+MEDALS_TOTAL = pd.DataFrame({
+    'country_code': ['FRA', 'GER', 'JPN', 'USA'],
+    'country': ['France', 'Germany', 'Japan', 'United States'],
+    'country_long': ['France', 'Germany', 'Japan', 'United States of America'],
+    'Gold Medal': [2, 0, 0, 0], 'Silver Medal': [0, 0, 1, 1], 'Bronze Medal': [0, 1, 0, 1], 'Total': [2, 1, 1, 2],
+})
+
+SPECS = [
+    FilterSpec(),
+    FilterSpec(countries=('France', 'United States')),
+    FilterSpec(continents=('Asia',), medal_types=('Silver',)),
+    FilterSpec(sports=('Swimming', 'Athletics'), medal_types=('Gold', 'Bronze')),
+]
+
+
+@pytest.fixture
+def engines(tables):
+    tables({'nocs': NOCS, 'medals': MEDALS, 'medals_total': MEDALS_TOTAL})
+    pin_generation()
+    return engine.PandasEngine(), engine.DuckDBEngine(engine.duckdb_connection())
+
+
+def normalized(frame, by):
+    return frame.astype({c: str for c in by}).sort_values(list(by), ignore_index=True)
+
+
+@pytest.mark.parametrize('spec', SPECS)
+@pytest.mark.parametrize('by', [('medal_type',), ('country',), ('Continent', 'discipline')])
+def test_engines_agree(engines, spec, by):
+    pandas_engine, duckdb_engine = engines
+    pd.testing.assert_frame_equal(normalized(pandas_engine.medal_counts(spec, by), by),
+                                  normalized(duckdb_engine.medal_counts(spec, by), by), check_dtype=False)
+    assert pandas_engine.medal_total(spec) == duckdb_engine.medal_total(spec)
+    totals = [e.country_medal_totals(spec).sort_values('country_code')['Filtered_Total'].tolist() for e in engines]
+    assert totals[0] == totals[1]
+
+
+def test_pinned_generation_keeps_its_duckdb_data(engines, tables):
+    generation = pin_generation()
+    before = engine.DuckDBEngine(engine.duckdb_connection())
+    # A refresh publishes two more medals, and a session on the new generation queries them
+    tables({'nocs': NOCS, 'medals': pd.concat([MEDALS, MEDALS.tail(2)]), 'medals_total': MEDALS_TOTAL})
+    pin_generation()
+    assert engine.DuckDBEngine(engine.duckdb_connection()).medal_total(FilterSpec()) == len(MEDALS) + 2
+    # A session still pinned to the old generation keeps getting its data
+    pin_generation(generation)
+    assert before.medal_total(FilterSpec()) == len(MEDALS)
+    assert engine.PandasEngine().medal_total(FilterSpec()) == len(MEDALS)
@@ -0,0 +1,137 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from utils import FilterSpec, filter_mask, filter_table, load_table, pin_generation
+
+NOCS = pd.DataFrame({
+    'code': ['FRA', 'GER', 'JPN', 'USA'],
+    'country': ['France', 'Germany', 'Japan', 'United States'],
+    'country_long': ['France', 'Germany', 'Japan', 'United States of America'],
+    'tag': ['france', 'germany', 'japan', 'united-states'],
+    'note': ['P', 'P', 'P', 'P'],
+})
+
+MEDALS = pd.DataFrame({
+    'medal_type': ['Gold Medal', 'Silver Medal', 'Bronze Medal', 'Gold Medal', 'Bronze Medal', 'Silver Medal'],
+    'medal_code': [1, 2, 3, 1, 3, 2],
+    'medal_date': ['2024-07-27', '2024-07-27', '2024-07-28', '2024-07-29', '2024-07-29', '2024-07-30'],
+    'name': ['A', 'B', 'C', 'D', 'E', 'F'],
+    'gender': ['M', 'W', 'M', 'W', 'M', 'W'],
+    'discipline': ['Judo', 'Judo', 'Swimming', 'Swimming', 'Athletics', 'Athletics'],
+    'event': ['Men -60 kg', 'Women -48 kg', "Men's 100m", "Women's 100m", "Men's 100m", "Women's 100m"],
+    'event_type': ['ATH'] * 6,
+    'code': ['1', '2', '3', '4', '5', '6'],
+    'country_code': ['FRA', 'JPN', 'USA', 'FRA', 'GER', 'USA'],
+    'country': ['France', 'Japan', 'United States', 'France', 'Germany', 'United States'],
+    'country_long': ['France', 'Japan', 'United States of America', 'France', 'Germany',
+                     'United States of America'],
+})
+
+ATHLETES = pd.DataFrame({
+    'code': [1, 2, 3, 4],
+    'name': ['A', 'B', 'C', 'D'],
+    'country_code': ['FRA', 'JPN', 'USA', 'FRA'],
+    'country': ['France', 'Japan', 'United States', 'France'],
+    'disciplines': ["['Judo']", "['Judo', 'Wrestling']", "['Swimming']", "['Athletics', 'Swimming']"],
+})
+
+
+@pytest.fixture
+def medal_tables(tables):
+    return tables({'nocs': NOCS, 'medals': MEDALS, 'athletes': ATHLETES})
+
+
+def reference(df, spec, country_column, sport_column, medal_column=None, list_sports=False):
+    """The filter as a plain pandas expression."""
+    keep = pd.Series(True, index=df.index)
+    if spec.countries:
+        keep &= df[country_column].astype(str).isin(spec.countries)
+    if spec.sports:
+        if list_sports:
+            keep &= df[sport_column].map(lambda v: any(s in v for s in spec.sports))
+        else:
+            keep &= df[sport_column].astype(str).isin(spec.sports)
+    if medal_column is not None:
+        keep &= df[medal_column].astype(str).isin([utils.MEDAL_COLUMNS[m] for m in spec.medal_types])
+    return keep.to_numpy()
+
+
+SPECS = [
+    FilterSpec(medal_types=('Gold', 'Silver', 'Bronze')),
+    FilterSpec(countries=('France',), medal_types=('Gold', 'Silver', 'Bronze')),
+    FilterSpec(sports=('Swimming', 'Judo'), medal_types=('Gold',)),
+    FilterSpec(countries=('France', 'United States'), sports=('Swimming',), medal_types=('Bronze', 'Gold')),
+    FilterSpec(countries=('Nowhere',), medal_types=('Gold',)),
+    FilterSpec(),
+]
+
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_medals_filter_matches_pandas(medal_tables, spec):
+    medals = load_table('medals')
+    expected = reference(MEDALS, spec, 'country', 'discipline', 'medal_type')
+    assert filter_table(medals, 'medals', spec)['name'].tolist() == MEDALS.loc[expected, 'name'].tolist()
+
+
+@pytest.mark.parametrize('spec', SPECS)
+def test_list_column_filter_matches_pandas(medal_tables, spec):
+    athletes = load_table('athletes')
+    expected = reference(ATHLETES, spec, 'country', 'disciplines', list_sports=True)
+    assert filter_table(athletes, 'athletes', spec)['name'].tolist() == ATHLETES.loc[expected, 'name'].tolist()
+
+
+def test_dimensions_restrict_which_filters_apply(medal_tables):
+    spec = FilterSpec(countries=('France',), sports=('Judo',), medal_types=('Gold',))
+    medals = load_table('medals')
+    by_country = filter_table(medals, 'medals', spec, ('country',))
+    assert by_country['name'].tolist() == ['A', 'D']
+    assert filter_mask('medals', FilterSpec(), ('country', 'sport')) is None
+
+
+def test_masks_are_shared_and_read_only(medal_tables):
+    spec = FilterSpec(countries=('Japan',), medal_types=('Silver',))
+    first, second = filter_mask('medals', spec), filter_mask('medals', spec)
+    assert np.array_equal(first, second)
+    mask = utils.dimension_mask('medals', 'country', ('Japan',))
+    assert mask is utils.dimension_mask('medals', 'country', ('Japan',))
+    assert not mask.flags.writeable
+
+
+def test_continents_select_their_countries(medal_tables):
+    spec = FilterSpec(continents=('Asia',), medal_types=('Gold', 'Silver', 'Bronze'))
+    assert filter_table(load_table('medals'), 'medals', spec)['name'].tolist() == ['B']
+
+
+def test_pinned_generation_keeps_masks_in_step_with_loaded_frames(medal_tables, tables):
+    pin_generation()
+    medals = load_table('medals')
+    # A refresh publishes a generation with one more medal while the rerun is still going
+    tables({'nocs': NOCS, 'medals': pd.concat([MEDALS, MEDALS.tail(1)]), 'athletes': ATHLETES})
+    spec = FilterSpec(countries=('United States',), medal_types=('Silver',))
+    assert filter_table(medals, 'medals', spec)['name'].tolist() == ['F']
+    # The next rerun pins the new generation and sees the new row
+    pin_generation()
+    assert filter_table(load_table('medals'), 'medals', spec)['name'].tolist() == ['F', 'F']
+
+
+def test_fragment_rerun_pins_the_generation_of_its_page_run(medal_tables, tables):
+    generation = pin_generation()
+    medals = load_table('medals')
+    tables({'nocs': NOCS, 'medals': pd.concat([MEDALS, MEDALS.tail(1)]), 'athletes': ATHLETES})
+    spec = FilterSpec(countries=('United States',), medal_types=('Silver',))
+    results = {}
+
+    # A fragment rerun runs on a thread of its own, with the frames of the last full run
+    def fragment(pinned):
+        pin_generation(pinned)
+        results[pinned is None] = len(filter_mask('medals', spec))
+
+    for pinned in (generation, None):
+        thread = threading.Thread(target=fragment, args=(pinned,))
+        thread.start()
+        thread.join()
+    assert results == {False: len(medals), True: len(medals) + 1}
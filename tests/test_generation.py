@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from utils import Generation
+
+
+def test_entries_are_built_once():
+    generation = Generation('v1')
+    calls = []
+
+    def load(x):
+        calls.append(x)
+        return x * 2
+
+    assert generation.get(load, (2,)) == 4
+    assert generation.get(load, (2,)) == 4
+    assert calls == [2]
+    assert generation.peek(load, (2,)) == 4
+
+
+def test_max_entries_keeps_the_most_recently_used():
+    generation = Generation('v1')
+
+    def load(x):
+        return x
+
+    for x in (1, 2, 1, 3):
+        generation.get(load, (x,), max_entries=2)
+    assert generation.peek(load, (1,)) == 1
+    assert generation.peek(load, (2,)) is None
+    assert generation.peek(load, (3,)) == 3
+
+
+def test_failed_build_is_retried_by_the_next_caller():
+    generation = Generation('v1')
+    attempts = []
+
+    def load(x):
+        attempts.append(x)
+        if len(attempts) == 1:
+            raise ValueError("unreadable")
+        return x
+
+    with pytest.raises(ValueError):
+        generation.get(load, (1,))
+    assert generation._building == {}
+    assert generation.peek(load, (1,)) is None
+    assert generation.get(load, (1,)) == 1
+    assert attempts == [1, 1]
+
+
+def test_waiters_are_released_when_the_build_fails():
+    generation = Generation('v1')
+    started, release = threading.Event(), threading.Event()
+    attempts = []
+
+    def load(x):
+        attempts.append(x)
+        if len(attempts) == 1:
+            started.set()
+            release.wait(5)
+            raise ValueError("unreadable")
+        return x
+
+    errors, results = [], []
+
+    def first():
+        try:
+            generation.get(load, (1,))
+        except ValueError as e:
+            errors.append(e)
+
+    def second():
+        results.append(generation.get(load, (1,)))
+
+    threads = [threading.Thread(target=first)]
+    threads[0].start()
+    assert started.wait(5)
+    threads.append(threading.Thread(target=second))
+    threads[1].start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+    assert len(errors) == 1
+    assert results == [1]
+    assert generation._building == {}
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from graph import NODE_KINDS, RelationGraph
+
+
+def small_graph():
+    """ARG and GER hockey, one men's and one women's team each, plus an athlete with no team.
+
+    Athletes 1-2 are ARG men, 3-4 ARG women, 5 a GER woman, 6 an ARG hockey player on no
+    team. Coach 10 coaches the ARG men, 11 the ARG women, 12 the GER women; staff member
+    99 is on both ARG teams but is not in coaches (no name).
+    """
+    keys = {
+        'athlete': pd.Index([1, 2, 3, 4, 5, 6]),
+        'team': pd.Index(['ARG-M', 'ARG-W', 'GER-W']),
+        'coach': pd.Index([10, 11, 12, 99]),
+        'discipline': pd.Index(['Hockey', 'Judo']),
+        'noc': pd.Index(['ARG', 'GER']),
+    }
+    labels = {kind: np.asarray(keys[kind].astype(str), dtype=object) for kind in NODE_KINDS}
+    labels['athlete'] = np.array(['A1', 'A2', 'A3', 'A4', 'A5', 'A6'], dtype=object)
+    labels['coach'] = np.array(['C10', 'C11', 'C12', np.nan], dtype=object)
+    ids = np.array
+    edges = [
+        ('athlete', ids([0, 1, 2, 3, 4, 5]), 'noc', ids([0, 0, 0, 0, 1, 0])),
+        ('athlete', ids([0, 1, 2, 3, 4, 5]), 'discipline', ids([0, 0, 0, 0, 0, 0])),
+        ('team', ids([0, 0, 1, 1, 2]), 'athlete', ids([0, 1, 2, 3, 4])),
+        ('team', ids([0, 0, 1, 1, 2]), 'coach', ids([0, 3, 1, 3, 2])),
+        ('team', ids([0, 1, 2]), 'discipline', ids([0, 0, 0])),
+        ('team', ids([0, 1, 2]), 'noc', ids([0, 0, 1])),
+        ('coach', ids([0, 1, 2]), 'discipline', ids([0, 0, 0])),
+        ('coach', ids([0, 1, 2]), 'noc', ids([0, 0, 1])),
+    ]
+    return RelationGraph(keys, labels, edges)
+
+
+def codes(graph, kind, ids):
+    return sorted(graph.keys[kind][ids].tolist())
+
+
+def test_team_coaches_leave_out_unnamed_staff():
+    graph = small_graph()
+    coaches, inferred = graph.coaches_of(3)
+    assert codes(graph, 'coach', coaches) == [11]
+    assert not inferred
+
+
+def test_shared_coach_stays_within_the_team():
+    graph = small_graph()
+    shared, inferred = graph.shared_coach(3)
+    # The ARG men share a NOC, a discipline and a staff member with athlete 3, but no coach
+    assert codes(graph, 'athlete', shared) == [4]
+    assert not inferred
+    assert codes(graph, 'athlete', graph.shared_coach(1)[0]) == [2]
+    assert codes(graph, 'athlete', graph.teammates(1)) == [2]
+
+
+def test_athlete_without_team_gets_inferred_national_coaches():
+    graph = small_graph()
+    coaches, inferred = graph.coaches_of(6)
+    assert inferred
+    # Coaches of ARG hockey only, not GER's coach of the same discipline
+    assert codes(graph, 'coach', coaches) == [10, 11]
+    shared, inferred = graph.shared_coach(6)
+    assert inferred
+    assert codes(graph, 'athlete', shared) == [1, 2, 3, 4]
+
+
+def test_pairs_are_matched_per_node_not_as_a_cross_product():
+    graph = small_graph()
+    nocs, disciplines = graph.pairs('coach', graph.node_ids('coach', [10, 12]))
+    pairs = sorted(zip(graph.keys['noc'][nocs], graph.keys['discipline'][disciplines]))
+    assert pairs == [('ARG', 'Hockey'), ('GER', 'Hockey')]
+    athletes = graph.paired(nocs, disciplines, 'athlete')
+    assert codes(graph, 'athlete', athletes) == [1, 2, 3, 4, 5, 6]
+    # The (ARG, Hockey) pair alone leaves out GER's hockey player
+    only_arg = graph.paired(np.array([0]), np.array([0]), 'athlete')
+    assert codes(graph, 'athlete', only_arg) == [1, 2, 3, 4, 6]
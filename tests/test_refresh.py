@@ -0,0 +1,98 @@
+import os
+
+import pandas as pd
+import pytest
+
+import utils
+from conftest import DATA_FOLDER, fresh_generation
+from test_filters import MEDALS, NOCS
+from utils import (active_generation, build_generation, data_version, load_table, pin_generation,
+                   publish_generation, table_update)
+
+EXTRA = pd.DataFrame({
+    'medal_type': ['Gold Medal', 'Bronze Medal'], 'medal_code': [1, 3],
+    'medal_date': ['2024-08-01', '2024-08-02'], 'name': ['G', 'H'], 'gender': ['M', 'W'],
+    'discipline': ['Rowing', 'Judo'], 'event': ['Men Single Sculls', 'Women -48 kg'],
+    'event_type': ['ATH', 'ATH'], 'code': ['7', '8'], 'country_code': ['NZL', 'JPN'],
+    'country': ['New Zealand', 'Japan'], 'country_long': ['New Zealand', 'Japan'],
+})
+
+
+def rewrite(frame):
+    """Replaces medals.csv, making sure its mtime moves even on coarse clocks."""
+    path = os.path.join(DATA_FOLDER, utils.TABLES['medals'])
+    before = os.stat(path).st_mtime_ns
+    frame.to_csv(path, index=False)
+    os.utime(path, ns=(before + 10 ** 9, before + 10 ** 9))
+
+
+def refresh():
+    """Rebuilds the active generation's entries for the data on disk, as the background refresher does."""
+    generation = build_generation(data_version(), active_generation().requests())
+    publish_generation(generation)
+    pin_generation()
+    return generation
+
+
+def full_read():
+    fresh_generation()
+    pin_generation()
+    return load_table('medals')
+
+
+CHANGES = {
+    'append': lambda: pd.concat([MEDALS, EXTRA], ignore_index=True),
+    'edit': lambda: MEDALS.assign(medal_type=MEDALS['medal_type'].where(MEDALS['name'] != 'C', 'Gold Medal')),
+    'delete': lambda: MEDALS.drop(index=[1, 4]),
+    'reorder': lambda: pd.concat([EXTRA, MEDALS.iloc[::-1]], ignore_index=True),
+}
+
+
+@pytest.mark.parametrize('change', CHANGES)
+def test_incremental_refresh_matches_a_full_read(tables, change):
+    tables({'nocs': NOCS, 'medals': MEDALS})
+    pin_generation()
+    load_table('medals')
+    table_update('medals')
+    rewrite(CHANGES[change]())
+
+    generation = refresh()
+    update = generation.peek(table_update.__wrapped__, ('medals',))
+    assert update is not None and update.order is not None
+    assert len(update.added) < len(CHANGES[change]())
+    refreshed = load_table('medals')
+
+    expected = full_read()
+    pd.testing.assert_frame_equal(refreshed, expected, check_categorical=False)
+
+
+def test_unchanged_file_reuses_the_previous_table(tables):
+    tables({'nocs': NOCS, 'medals': MEDALS})
+    pin_generation()
+    before = load_table('medals')
+    generation = refresh()
+    update = generation.peek(table_update.__wrapped__, ('medals',))
+    assert update is not None and update.order is None
+    pd.testing.assert_frame_equal(load_table('medals'), before)
+
+
+def test_new_header_falls_back_to_a_full_read(tables):
+    tables({'nocs': NOCS, 'medals': MEDALS})
+    pin_generation()
+    load_table('medals')
+    rewrite(MEDALS.assign(url=''))
+    generation = refresh()
+    assert generation.peek(table_update.__wrapped__, ('medals',)) is None
+    assert 'url' in load_table('medals').columns
+
+
+def test_text_in_a_numeric_column_falls_back_to_a_full_read(tables):
+    # medals.code is digits until a team medal brings a code like 'DIVW3MTEAM2-CHN01'
+    tables({'nocs': NOCS, 'medals': MEDALS})
+    pin_generation()
+    load_table('medals')
+    rewrite(pd.concat([MEDALS, EXTRA.assign(code=['7', 'X8'])], ignore_index=True))
+    generation = refresh()
+    assert generation.peek(table_update.__wrapped__, ('medals',)) is None
+    refreshed = load_table('medals')
+    pd.testing.assert_frame_equal(refreshed, full_read(), check_categorical=False)
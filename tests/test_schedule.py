@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from schedule import SessionIndex, to_epoch_ns
+
+HOUR = 3_600 * 10 ** 9
+
+
+def random_sessions(seed, rows=200):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-07-27 08:00', tz='Europe/Paris') + pd.to_timedelta(rng.integers(0, 72 * 60, rows),
+                                                                                 unit='min')
+    length = pd.to_timedelta(rng.integers(10, 6 * 60, rows), unit='min')
+    return pd.DataFrame({'start_date': start, 'end_date': start + length,
+                         'venue': rng.choice(['Arena', 'Pool', 'Stadium'], rows), 'id': np.arange(rows)})
+
+
+@pytest.fixture
+def sessions():
+    return random_sessions(0)
+
+
+@pytest.fixture
+def index(sessions):
+    return SessionIndex(sessions, 'start_date', 'end_date')
+
+
+def windows(seed, count=50):
+    rng = np.random.default_rng(seed)
+    base = to_epoch_ns(pd.Timestamp('2024-07-27', tz='Europe/Paris'))
+    starts = base + rng.integers(0, 80, count) * HOUR
+    return [(int(s), int(s + rng.integers(0, 12) * HOUR + 1)) for s in starts]
+
+
+def test_positions_match_a_scan(sessions, index):
+    starts, ends = to_epoch_ns(sessions['start_date']), to_epoch_ns(sessions['end_date'])
+    for start, end in windows(1):
+        expected = sessions.loc[(starts < end) & (ends > start), 'id']
+        assert sorted(index.sessions.loc[index.positions(start, end), 'id']) == sorted(expected)
+
+
+def test_at_is_started_and_not_ended(sessions, index):
+    moment = pd.Timestamp('2024-07-28 12:00', tz='Europe/Paris')
+    expected = sessions[(sessions['start_date'] <= moment) & (sessions['end_date'] > moment)]
+    assert sorted(index.at(moment)['id']) == sorted(expected['id'])
+
+
+
+def test_at_applies_a_mask_over_the_source_rows(sessions, index):
+    moment = pd.Timestamp('2024-07-28 12:00', tz='Europe/Paris')
+    mask = (sessions['venue'] == 'Pool').to_numpy()
+    expected = sessions[mask & (sessions['start_date'] <= moment) & (sessions['end_date'] > moment)]
+    assert sorted(index.at(moment, mask)['id']) == sorted(expected['id'])
+    assert (index.sessions['id'].to_numpy() == index.rows).all()
+
+
+def covered(sessions, start, end):
+    """Length of the union of the sessions' intervals clipped to [start, end), by sweeping minutes."""
+    minute = 60 * 10 ** 9
+    grid = np.arange(start, end, minute)
+    busy = np.zeros(len(grid), dtype=bool)
+    for s, e in zip(to_epoch_ns(sessions['start_date']), to_epoch_ns(sessions['end_date'])):
+        busy |= (grid >= s) & (grid < e)
+    return int(busy.sum()) * minute
+
+
+@pytest.mark.parametrize('venue', ['Arena', 'Pool', 'Stadium'])
+def test_busy_ns_is_the_union_of_overlapping_sessions(sessions, venue):
+    group = sessions[sessions['venue'] == venue]
+    index = SessionIndex(group, 'start_date', 'end_date')
+    # Session times are whole minutes, so sampling every minute measures the union exactly
+    for start, end in windows(2, count=10):
+        start, end = start - start % (60 * 10 ** 9), end - end % (60 * 10 ** 9)
+        assert index.busy_ns(start, end) == covered(group, start, end)
+
+
+def test_sessions_with_missing_times_are_left_out():
+    sessions = random_sessions(3, rows=5)
+    sessions.loc[2, 'end_date'] = pd.NaT
+    index = SessionIndex(sessions, 'start_date', 'end_date')
+    assert len(index) == 4
+    assert 2 not in index.sessions['id'].tolist()
+    assert index.sessions['start_date'].is_monotonic_increasing
@@ -0,0 +1,65 @@
+import pytest
+
+from search import AthleteSearchIndex, normalize
+
+NAMES = ['MARCHAND Leon', 'EVENEPOEL Remco', 'WARHOLM Karsten', 'INGEBRIGTSEN Jakob',
+         'FURMAN Marta', 'ŁUKASZCZYK Paweł', 'SØRENSEN Ærø', 'ĐOKOVIĆ Novak', 'STRAßER Linus']
+
+
+@pytest.fixture
+def index():
+    rows = list(range(100, 100 + len(NAMES)))
+    return AthleteSearchIndex(rows, [f'A{r}' for r in rows], NAMES)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Léon MARCHAND", "leon marchand"),
+    ("Øyvind", "oyvind"),
+    ("Łukasz", "lukasz"),
+    ("Straße", "strasse"),
+    ("Ærø", "aero"),
+    ("Đoković", "dokovic"),
+    ("O'Connor-Smith", "o connor smith"),
+])
+def test_normalize_keeps_letters_without_decomposition(text, expected):
+    assert normalize(text) == expected
+
+
+def names(results):
+    return [name for _, name, _ in results]
+
+
+def test_tokens_match_in_any_order(index):
+    assert names(index.search('remco evenepoel'))[0] == 'EVENEPOEL Remco'
+    assert names(index.search('EVENEPOEL Remco'))[0] == 'EVENEPOEL Remco'
+
+
+def test_prefixes_rank_before_fuzzy_matches(index):
+    results = index.search('mar')
+    assert set(names(results)[:2]) == {'MARCHAND Leon', 'FURMAN Marta'}
+    assert all(score >= 1 for _, _, score in results[:2])
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('lukaszczyk', 'ŁUKASZCZYK Paweł'),
+    ('Łukaszczyk pawel', 'ŁUKASZCZYK Paweł'),
+    ('sorensen', 'SØRENSEN Ærø'),
+    ('aero', 'SØRENSEN Ærø'),
+    ('djokovic', 'ĐOKOVIĆ Novak'),
+    ('strasser', 'STRAßER Linus'),
+])
+def test_transliterated_names_are_found(index, query, expected):
+    assert names(index.search(query))[0] == expected
+
+
+def test_typos_fall_back_to_trigrams(index):
+    results = index.search('ingebrigsten')
+    assert names(results)[0] == 'INGEBRIGTSEN Jakob'
+    assert results[0][2] < 1
+
+
+def test_allowed_restricts_rows_and_k_limits_results(index):
+    assert [row for row, _, _ in index.search('mar', allowed=[104])] == [104]
+    assert len(index.search('a', k=3)) <= 3
+    assert index.search('   ') == []
+    assert index.row_for_code('A101') == 101
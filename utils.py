@@ -3,89 +3,1147 @@ import pandas as pd
 import os
 import pycountry_convert as pc
 import ast
+import hashlib
+import json
+import functools
+import inspect
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import NamedTuple
+import numpy as np
+from streamlit.runtime.scriptrunner import get_script_run_ctx, add_script_run_ctx
 
-DATA_FOLDER = 'data'
-
-@st.cache_data
-def load_data():
-    """Loads all necessary datasets from the data folder."""
-    data = {}
-    files = [
-        'athletes.csv', 'coaches.csv', 'events.csv', 'medals.csv', 
-        'medals_total.csv', 'medallists.csv', 'nocs.csv', 'schedules.csv', 
-        'schedules_preliminary.csv', 'teams.csv', 'technical_officials.csv', 
-        'torch_route.csv', 'venues.csv'
-    ]
-    
-    for file in files:
-        path = os.path.join(DATA_FOLDER, file)
-        if os.path.exists(path):
+from profiling import span, count_cache
+
+DATA_FOLDER = os.environ.get('DATA_FOLDER', 'data')
+CACHE_FOLDER = os.path.join(DATA_FOLDER, '.cache')
+MANIFEST_FILE = os.path.join(CACHE_FOLDER, 'manifest.json')
+
+TABLES = {os.path.splitext(file)[0]: file for file in [
+    'athletes.csv', 'coaches.csv', 'events.csv', 'medals.csv',
+    'medals_total.csv', 'medallists.csv', 'nocs.csv', 'schedules.csv',
+    'schedules_preliminary.csv', 'teams.csv', 'technical_officials.csv',
+    'torch_route.csv', 'venues.csv'
+]}
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+TIMEZONE = 'Europe/Paris'
+
+# Tables are shared across sessions as shallow copies (see load_table), which is only safe
+# with copy-on-write; it is always on from pandas 3.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Declared dtypes per table. 'date' parses to a naive datetime64, 'datetime' to a
+# tz-aware timestamp in TIMEZONE; anything else is passed to ``astype``.
+SCHEMAS = {
+    'athletes': {
+        'code': 'int32', 'gender': 'category', 'country_code': 'category', 'country': 'category',
+        'country_long': 'category', 'nationality': 'category', 'birth_date': 'date',
+        'height': 'Int16', 'weight': 'Int16',
+    },
+    'coaches': {
+        'code': 'int32', 'gender': 'category', 'function': 'category', 'category': 'category',
+        'country_code': 'category', 'country': 'category', 'country_long': 'category',
+        'disciplines': 'category', 'events': 'category', 'birth_date': 'date',
+    },
+    'events': {
+        'tag': 'category', 'sport': 'category', 'sport_code': 'category', 'sport_url': 'category',
+    },
+    'medallists': {
+        'medal_date': 'date', 'medal_type': 'category', 'medal_code': 'Int8', 'gender': 'category',
+        'country_code': 'category', 'country': 'category', 'country_long': 'category',
+        'nationality_code': 'category', 'nationality': 'category', 'nationality_long': 'category',
+        'team': 'category', 'team_gender': 'category', 'discipline': 'category',
+        'event': 'category', 'event_type': 'category', 'birth_date': 'date', 'code_athlete': 'int32',
+    },
+    'medals': {
+        'medal_type': 'category', 'medal_code': 'Int8', 'medal_date': 'date', 'gender': 'category',
+        'code': 'category', 'discipline': 'category', 'event': 'category', 'event_type': 'category',
+        'country_code': 'category', 'country': 'category', 'country_long': 'category',
+    },
+    'medals_total': {
+        'Gold Medal': 'int16', 'Silver Medal': 'int16', 'Bronze Medal': 'int16', 'Total': 'int16',
+    },
+    'nocs': {
+        'note': 'category',
+    },
+    'schedules': {
+        'start_date': 'datetime', 'end_date': 'datetime', 'day': 'date', 'status': 'category',
+        'discipline': 'category', 'discipline_code': 'category', 'event': 'category',
+        'event_medal': 'int8', 'gender': 'category', 'event_type': 'category',
+        'venue': 'category', 'venue_code': 'category', 'location_description': 'category',
+        'location_code': 'category',
+    },
+    'schedules_preliminary': {
+        'date_start_utc': 'datetime', 'date_end_utc': 'datetime', 'medal': 'Int8',
+        'venue_code': 'category', 'description': 'category', 'venue_code_other': 'category',
+        'discription_other': 'category', 'team_1_code': 'category', 'team_1': 'category',
+        'team_2_code': 'category', 'team_2': 'category', 'tag': 'category',
+        'sport': 'category', 'sport_code': 'category', 'sport_url': 'category',
+    },
+    'teams': {
+        'team': 'category', 'team_gender': 'category', 'country_code': 'category',
+        'country': 'category', 'country_long': 'category', 'discipline': 'category',
+        'disciplines_code': 'category', 'events': 'category',
+        'num_athletes': 'Int16', 'num_coaches': 'Int16',
+    },
+    'technical_officials': {
+        'code': 'int32', 'gender': 'category', 'function': 'category', 'category': 'category',
+        'organisation_code': 'category', 'organisation': 'category',
+        'organisation_long': 'category', 'disciplines': 'category', 'birth_date': 'date',
+    },
+    'torch_route': {
+        'date_start': 'datetime', 'date_end': 'datetime', 'stage_number': 'Int16',
+    },
+    'venues': {
+        'date_start': 'datetime', 'date_end': 'datetime',
+    },
+}
+
+
+def file_hash(path):
+    """Returns the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def data_version():
+    """Fingerprint of the size and mtime of every source file; changes whenever data/ does."""
+    stats = []
+    for file in TABLES.values():
+        try:
+            stat = os.stat(os.path.join(DATA_FOLDER, file))
+            stats.append((file, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stats.append((file, None, None))
+    return hashlib.sha256(repr(stats).encode()).hexdigest()[:12]
+
+class Generation:
+    """Everything loaded or derived from one version of the data folder.
+
+    Each entry is built at most once: concurrent callers of the same key wait for the
+    in-flight build instead of repeating it. Functions given ``max_entries`` keep only their
+    most recently used entries.
+    """
+
+    def __init__(self, version):
+        self.version = version
+        # While being built by a refresh, the generation it replaces; see table_update
+        self.previous = None
+        # Table name -> TableSource of the file its full table was read from
+        self.sources = {}
+        # Entity -> vocabulary of the keys loaded so far; see entity_vocabulary
+        self.vocabularies = {}
+        self._entries = {}
+        self._limits = {}
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, func, args, max_entries=None):
+        with self._lock:
+            entries = self._entries.setdefault(func, OrderedDict())
+            self._limits[func] = max_entries
+            if args in entries:
+                entries.move_to_end(args)
+                count_cache(func.__name__, True)
+                return entries[args]
+            build_lock = self._building.setdefault((func, args), threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                if args in entries:
+                    count_cache(func.__name__, True)
+                    return entries[args]
+            count_cache(func.__name__, False)
             try:
-                data[file.split('.')[0]] = pd.read_csv(path)
-            except Exception as e:
-                st.error(f"Error loading {file}: {e}")
+                with span(func.__name__, args=args):
+                    value = func(*args)
+                with self._lock:
+                    entries[args] = value
+                    if max_entries and len(entries) > max_entries:
+                        entries.popitem(last=False)
+            finally:
+                # On error too, so the next caller builds again instead of waiting on this build
+                with self._lock:
+                    self._building.pop((func, args), None)
+            return value
+
+    def peek(self, func, args):
+        """The entry for ``args`` if it is already built, else None."""
+        with self._lock:
+            return self._entries.get(func, {}).get(args)
+
+    def requests(self):
+        """``(func, args, max_entries)`` of every entry, oldest first."""
+        with self._lock:
+            return [(func, args, self._limits[func])
+                    for func, entries in self._entries.items() for args in entries]
+
+_active_generation = None
+_active_lock = threading.Lock()
+_local = threading.local()
+
+def active_generation():
+    """The generation sessions currently read from, created for the data on disk on first use."""
+    global _active_generation
+    if _active_generation is None:
+        with _active_lock:
+            if _active_generation is None:
+                _active_generation = Generation(data_version())
+    return _active_generation
+
+def current_generation():
+    """The generation being built or pinned by this thread, if any, else the active one."""
+    return getattr(_local, 'generation', None) or active_generation()
+
+def pin_generation(generation=None):
+    """Pins ``generation`` (by default the active one) for the rest of this script run; returns it.
+
+    Call at the top of each page. A refresh can publish a new generation mid-rerun. Pinned,
+    every table, mask and derived structure the rerun looks up comes from the same data as
+    the frames it already holds. Fragments rerun on their own, so they take the generation
+    of the page run that drew them and pin it again.
+    """
+    _local.generation = generation or active_generation()
+    return _local.generation
+
+def build_generation(version, requests=()):
+    """Builds a new Generation off to the side by replaying ``requests`` (see Generation.requests).
+
+    While it is built, loaders can reuse what the active generation already holds.
+    """
+    generation = Generation(version)
+    generation.previous = active_generation()
+    _local.generation = generation
+    try:
+        for func, args, max_entries in requests:
+            generation.get(func, args, max_entries)
+    finally:
+        _local.generation = None
+        generation.previous = None
+    return generation
+
+def publish_generation(generation):
+    """Makes ``generation`` the active one; sessions pick it up on their next rerun."""
+    global _active_generation
+    _active_generation = generation
+
+def generation_cache(func=None, *, max_entries=None):
+    """Caches a loader per data Generation, like ``st.cache_resource`` but swappable.
+
+    Results are shared by every session. When data/ changes, the background refresher
+    replays every cached call against the new data before swapping it in.
+    """
+    if func is None:
+        return functools.partial(generation_cache, max_entries=max_entries)
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return current_generation().get(func, tuple(bound.arguments.values()), max_entries)
+    return wrapper
+
+def load_manifest():
+    """Reads the columnar cache manifest, or an empty one if it is missing or corrupt."""
+    try:
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    try:
+        os.makedirs(CACHE_FOLDER, exist_ok=True)
+        tmp_path = f"{MANIFEST_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, MANIFEST_FILE)
+    except OSError:
+        pass
+
+_manifest_lock = threading.Lock()
+
+def update_manifest(manifest, keys):
+    """Saves the ``keys`` entries of ``manifest`` (dropping the ones it lacks) over the manifest on disk.
+
+    Only those entries are written, so loaders running on other threads do not lose theirs.
+    """
+    with _manifest_lock:
+        saved = load_manifest()
+        for key in keys:
+            if key in manifest:
+                saved[key] = manifest[key]
+            else:
+                saved.pop(key, None)
+        save_manifest(saved)
+
+def schema_version(name):
+    """Short fingerprint of a table's declared schema, stored in the cache manifest."""
+    return hashlib.sha256(repr(sorted(SCHEMAS.get(name, {}).items())).encode()).hexdigest()[:12]
+
+def apply_schema(name, df):
+    """Converts the columns of ``df`` to the dtypes declared for table ``name``."""
+    for column, dtype in SCHEMAS.get(name, {}).items():
+        if column not in df.columns:
+            continue
+        if dtype == 'date':
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif dtype == 'datetime':
+            df[column] = pd.to_datetime(df[column], errors='coerce', utc=True).dt.tz_convert(TIMEZONE)
         else:
-            st.warning(f"File {file} not found in {DATA_FOLDER}")
-            #empty dataframe with expected columns to prevent crashes if file missing
-            data[file.split('.')[0]] = pd.DataFrame()
+            df[column] = df[column].astype(dtype)
+    return df
+
+def select_columns(df, columns):
+    """Restricts ``df`` to the requested columns that actually exist, keeping file order."""
+    if columns is None:
+        return df
+    return df[[c for c in df.columns if c in columns]]
+
+def read_parquet_columns(path, columns=None):
+    """Reads a Parquet file, restricted to the requested columns that it actually holds."""
+    if columns is None:
+        return pd.read_parquet(path)
+    available = pyarrow.parquet.read_schema(path).names
+    return pd.read_parquet(path, columns=[c for c in available if c in columns])
 
-    return data
+# Unit of timestamps parsed from text: microseconds from pandas 3, nanoseconds before
+TEXT_DATETIME_UNIT = pd.to_datetime(pd.Series(['2024-07-26'])).dt.unit
 
-def get_continent(country_name):
+def parse_csv(path):
+    """Parses a whole source CSV, with pyarrow's multithreaded reader when it is installed.
+
+    Columns pyarrow types differently from the default parser come back as objects (times,
+    mixed values) and are re-read with the default parser, and timestamps get its unit, so
+    the frame is the same as ``pd.read_csv(path)``. Files pyarrow cannot parse fall back to
+    the default parser.
+    """
+    if not PARQUET_AVAILABLE:
+        return pd.read_csv(path)
     try:
-        country_code = pc.country_name_to_country_alpha2(country_name, cn_name_format="default")
-        continent_code = pc.country_alpha2_to_continent_code(country_code)
-        continent_name = pc.convert_continent_code_to_continent_name(continent_code)
-        return continent_name
-    except:
-        return "Unknown"
+        df = pd.read_csv(path, engine='pyarrow')
+    except ValueError:
+        # pyarrow.ArrowInvalid, e.g. a column whose values change type past the first block
+        return pd.read_csv(path)
+    objects = [c for c in df.columns if df[c].dtype == object]
+    if objects:
+        df[objects] = pd.read_csv(path, usecols=objects)[objects]
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.as_unit(TEXT_DATETIME_UNIT)
+    return df
+
+def read_csv_cached(file, manifest, columns=None):
+    """Reads a CSV through the Parquet cache, re-converting it only when the source changed.
+
+    A cache entry is reused when the source size and mtime match the manifest, or when
+    only the mtime moved but the content hash is unchanged; a change to the table's declared
+    schema also invalidates it. ``manifest`` is updated in place.
+    ``columns`` restricts the read to those columns; names missing from the file are ignored.
+    """
+    name = os.path.splitext(file)[0]
+    path = os.path.join(DATA_FOLDER, file)
+    if not PARQUET_AVAILABLE:
+        usecols = (lambda c: c in columns) if columns is not None else None
+        with span('read_csv', file=file):
+            return apply_schema(name, pd.read_csv(path, usecols=usecols))
+
+    stat = os.stat(path)
+    cache_path = os.path.join(CACHE_FOLDER, name + '.parquet')
+    entry = manifest.get(file)
+    schema = schema_version(name)
+
+    if (entry and entry.get('size') == stat.st_size and entry.get('schema') == schema
+            and os.path.exists(cache_path)):
+        fresh = entry.get('mtime') == stat.st_mtime_ns
+        if not fresh and entry.get('sha256') == file_hash(path):
+            entry['mtime'] = stat.st_mtime_ns
+            fresh = True
+        if fresh:
+            with span('read_parquet', file=file):
+                return read_parquet_columns(cache_path, columns)
+
+    with span('read_csv', file=file):
+        df = apply_schema(name, parse_csv(path))
+    try:
+        os.makedirs(CACHE_FOLDER, exist_ok=True)
+        # Another thread may be converting the same file; readers only ever see a complete one
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+        manifest[file] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': file_hash(path),
+                          'schema': schema}
+    except (OSError, ValueError, TypeError):
+        # Unwritable folder or a column pyarrow can't encode: serve the CSV uncached
+        manifest.pop(file, None)
+    return select_columns(df, columns)
+
+# Prebuilt artifacts written by build.py, one folder per artifact version. An empty
+# ARTIFACT_FOLDER disables them and everything is derived in-process.
+ARTIFACT_FOLDER = os.environ.get('ARTIFACT_FOLDER', os.path.join(DATA_FOLDER, '.artifacts'))
+# Bump whenever the layout or content of the artifacts changes
+ARTIFACT_FORMAT = 2
+
+def source_hashes():
+    """sha256 of every source file present, reusing the manifest's hash when size and mtime match."""
+    manifest = load_manifest()
+    hashes = {}
+    for file in TABLES.values():
+        path = os.path.join(DATA_FOLDER, file)
+        size, mtime = file_stat(path)
+        if size is None:
+            continue
+        entry = manifest.get(file, {})
+        if entry.get('size') == size and entry.get('mtime') == mtime and entry.get('sha256'):
+            hashes[file] = entry['sha256']
+        else:
+            hashes[file] = file_hash(path)
+    return hashes
+
+def artifact_version(hashes):
+    """Name of the artifact build for sources with content ``hashes``, under the current schemas.
+
+    Only file content counts, not mtimes, so artifacts built in CI match a fresh checkout.
+    """
+    key = (ARTIFACT_FORMAT, sorted(hashes.items()), sorted((name, schema_version(name)) for name in TABLES),
+           sorted(NOC_OVERRIDES.items()), sorted(ENTITIES.items()), sorted(LIST_COLUMNS.items()))
+    return hashlib.sha256(repr(key).encode()).hexdigest()[:12]
+
+@generation_cache
+def artifact_folder():
+    """Folder of the prebuilt artifacts for the data on disk, or None when there is no such build."""
+    if not ARTIFACT_FOLDER or not PARQUET_AVAILABLE:
+        return None
+    folder = os.path.join(ARTIFACT_FOLDER, artifact_version(source_hashes()))
+    return folder if os.path.isdir(folder) else None
+
+def artifact_path(*parts):
+    """Path of one prebuilt artifact file, or None if it was not built for the data on disk."""
+    folder = artifact_folder()
+    if folder is None:
+        return None
+    path = os.path.join(folder, *parts)
+    return path if os.path.exists(path) else None
+
+# NOCs pycountry can't resolve (historic, neutral and renamed teams):
+# code -> (display name, ISO alpha-2, ISO alpha-3, continent)
+NOC_OVERRIDES = {
+    'AHO': ('Netherlands Antilles', 'AN', 'ANT', 'North America'),
+    'AIN': ('Individual Neutral Athletes', None, None, 'Europe'),
+    'BOC': ('BOC', None, None, 'Other'),
+    'CIS': ('Commonwealth of Independent States', None, None, 'Europe'),
+    'COR': ('Korea (Unified Team)', None, None, 'Asia'),
+    'EOR': ('Refugee Olympic Team', None, None, 'Other'),
+    'EUN': ('Unified Team', None, None, 'Europe'),
+    'GDR': ('German Democratic Republic', 'DD', 'DDR', 'Europe'),
+    'HKG': ('Hong Kong, China', 'HK', 'HKG', 'Asia'),
+    'IOA': ('Independent Olympic Athletes', None, None, 'Other'),
+    'IOP': ('Independent Olympic Participants', None, None, 'Europe'),
+    'ISV': ('Virgin Islands, US', 'VI', 'VIR', 'North America'),
+    'KOR': ('Republic of Korea', 'KR', 'KOR', 'Asia'),
+    'KOS': ('Kosovo', 'XK', 'XKX', 'Europe'),
+    'OAR': ('Olympic Athletes from Russia', 'RU', 'RUS', 'Europe'),
+    'ROC': ('ROC', 'RU', 'RUS', 'Europe'),
+    'ROT': ('Refugee Olympic Team', None, None, 'Other'),
+    'SCG': ('Serbia and Montenegro', 'CS', 'SCG', 'Europe'),
+    'TCH': ('Czechoslovakia', 'CS', 'CSK', 'Europe'),
+    'TLS': ('Timor-Leste', 'TL', 'TLS', 'Asia'),
+    'TPE': ('Chinese Taipei', 'TW', 'TWN', 'Asia'),
+    'URS': ('USSR', 'SU', 'SUN', 'Europe'),
+    'VIN': ('St Vincent and the Grenadines', 'VC', 'VCT', 'North America'),
+    'YUG': ('Yugoslavia', 'YU', 'YUG', 'Europe'),
+}
+
+NOC_DIMENSION_FILE = os.path.join(CACHE_FOLDER, 'noc_dimension.parquet')
+NOC_DIMENSION_COLUMNS = ['code', 'name', 'iso2', 'iso3', 'Continent']
+
+def resolve_country(name):
+    """Resolves a country name to (ISO alpha-2, ISO alpha-3, continent), or None."""
+    if not isinstance(name, str):
+        return None
+    try:
+        alpha2 = pc.country_name_to_country_alpha2(name, cn_name_format="default")
+        continent_code = pc.country_alpha2_to_continent_code(alpha2)
+        alpha3 = pc.country_name_to_country_alpha3(name, cn_name_format="default")
+    except (KeyError, TypeError):
+        return None
+    return alpha2, alpha3, pc.convert_continent_code_to_continent_name(continent_code)
+
+def build_noc_dimension(nocs):
+    """Builds the NOC dimension: one row per ``nocs.code`` with display name, ISO codes and continent.
+
+    Each distinct country name is resolved once; ``NOC_OVERRIDES`` wins over pycountry, and
+    NOCs resolved by neither land in an explicit 'Unknown' continent.
+    """
+    names = pd.unique(pd.concat([nocs['country'], nocs['country_long']]).dropna())
+    resolved = {name: resolve_country(name) for name in names}
+
+    rows = []
+    for code, country, country_long in zip(nocs['code'], nocs['country'], nocs['country_long']):
+        if code in NOC_OVERRIDES:
+            rows.append((code,) + NOC_OVERRIDES[code])
+            continue
+        match = resolved.get(country) or resolved.get(country_long)
+        rows.append((code, country) + (match or (None, None, 'Unknown')))
+
+    dimension = pd.DataFrame(rows, columns=NOC_DIMENSION_COLUMNS)
+    dimension['Continent'] = dimension['Continent'].astype('category')
+    return dimension
+
+@generation_cache
+def load_noc_dimension():
+    """Returns the NOC dimension, rebuilding the persisted copy only when nocs.csv or the overrides change."""
+    path = artifact_path('noc_dimension.parquet')
+    if path is not None:
+        return pd.read_parquet(path)
+    manifest = load_manifest()
+    nocs = read_csv_cached(TABLES['nocs'], manifest)
+    key = {
+        'source': manifest.get(TABLES['nocs'], {}).get('sha256'),
+        'overrides': hashlib.sha256(repr(sorted(NOC_OVERRIDES.items())).encode()).hexdigest()[:12],
+    }
+
+    entry = manifest.get('noc_dimension')
+    if (PARQUET_AVAILABLE and key['source'] and entry == key
+            and os.path.exists(NOC_DIMENSION_FILE)):
+        return pd.read_parquet(NOC_DIMENSION_FILE)
+
+    dimension = build_noc_dimension(nocs)
+    if PARQUET_AVAILABLE and key['source']:
+        try:
+            dimension.to_parquet(NOC_DIMENSION_FILE, index=False)
+            manifest['noc_dimension'] = key
+        except (OSError, ValueError, TypeError):
+            manifest.pop('noc_dimension', None)
+    update_manifest(manifest, [TABLES['nocs'], 'noc_dimension'])
+    return dimension
+
+def add_continent(nocs):
+    """Joins the continent from the NOC dimension onto ``nocs`` by code."""
+    continents = load_noc_dimension().set_index('code')['Continent']
+    nocs['Continent'] = nocs['code'].map(continents)
+    return nocs
+
+# Table name -> (columns the processor needs, processor) applied by process_data
+PROCESSORS = {
+    'nocs': (['code'], add_continent),
+}
+
+# Entity -> (table, column) pairs holding its keys. Each entity has one integer id space
+# shared by every listed column, so joins and filters across tables compare category codes.
+# Columns listed in LIST_COLUMNS contribute their items but stay list-encoded.
+ENTITIES = {
+    'noc': [('nocs', 'code'), ('athletes', 'country_code'), ('coaches', 'country_code'),
+            ('medals', 'country_code'), ('medals_total', 'country_code'),
+            ('medallists', 'country_code'), ('teams', 'country_code')],
+    'athlete': [('athletes', 'code'), ('medallists', 'code_athlete'), ('teams', 'athletes_codes')],
+    'coach': [('coaches', 'code'), ('teams', 'coaches_codes')],
+    'discipline': [('events', 'sport'), ('coaches', 'disciplines'), ('medals', 'discipline'),
+                   ('medallists', 'discipline'), ('schedules', 'discipline'), ('teams', 'discipline')],
+    'event': [('events', 'event'), ('medals', 'event'), ('medallists', 'event'),
+              ('schedules', 'event'), ('teams', 'events')],
+}
+ENTITY_COLUMNS = {}
+for entity, sources in ENTITIES.items():
+    for table, column in sources:
+        ENTITY_COLUMNS.setdefault(table, {})[column] = entity
+
+def entity_keys(values):
+    """The distinct keys held by ``values``, a column or bridge of an entity."""
+    values = values.dropna()
+    return values.cat.categories.to_series() if values.dtype == 'category' else values
+
+_vocabulary_lock = threading.Lock()
+
+def entity_vocabulary(entity, keys=None):
+    """The vocabulary of ``entity``, first extended by ``keys``; position is the id.
+
+    Read from the build artifact when there is one. Otherwise it holds the keys of the
+    tables and bridges loaded so far in this generation (see intern_entities), so loading
+    one table never reads the others. New keys are appended, sorted, so ids handed out
+    earlier stay valid; a refresh starts from the previous generation's vocabulary.
+    """
+    generation = current_generation()
+    with _vocabulary_lock:
+        vocabulary = generation.vocabularies.get(entity)
+        if vocabulary is None:
+            path = artifact_path('vocabularies', entity + '.parquet')
+            previous = generation.previous.vocabularies.get(entity) if generation.previous else None
+            if path is not None:
+                vocabulary = pd.Index(pd.read_parquet(path)['key']).rename(None)
+            elif previous is not None:
+                vocabulary = previous
+        if keys is not None:
+            new_keys = pd.Index(pd.unique(keys)).sort_values()
+            if vocabulary is None:
+                vocabulary = new_keys
+            else:
+                new_keys = new_keys.difference(vocabulary, sort=False)
+                if len(new_keys):
+                    vocabulary = vocabulary.append(new_keys)
+        if vocabulary is None:
+            return pd.Index([])
+        generation.vocabularies[entity] = vocabulary
+        return vocabulary
+
+def complete_vocabulary(entity):
+    """The vocabulary of ``entity`` over every table in ENTITIES, loading them all; for build.py."""
+    for table, column in ENTITIES[entity]:
+        if not os.path.exists(os.path.join(DATA_FOLDER, TABLES[table])):
+            continue
+        if column in LIST_COLUMNS.get(table, []):
+            shared_bridge(table, column)
+        else:
+            shared_table(table, (column,))
+    return entity_vocabulary(entity)
+
+def intern_entities(name, df):
+    """Recodes the entity columns of table ``name`` onto their shared vocabularies, in place.
+
+    Keys not in a vocabulary yet are added to it.
+    """
+    for column, entity in ENTITY_COLUMNS.get(name, {}).items():
+        if column in df.columns and column not in LIST_COLUMNS.get(name, []):
+            vocabulary = entity_vocabulary(entity, entity_keys(df[column]))
+            df[column] = pd.Categorical(df[column], categories=vocabulary)
+    return df
+
+def recategorize(name, df):
+    """``df`` with its entity columns moved onto the current vocabularies, codes remapped."""
+    df = df.copy(deep=False)
+    for column, entity in ENTITY_COLUMNS.get(name, {}).items():
+        if column in df.columns and df[column].dtype == 'category':
+            vocabulary = entity_vocabulary(entity)
+            if not df[column].cat.categories.equals(vocabulary):
+                df[column] = df[column].cat.set_categories(vocabulary)
+    return df
+
+def entity_ids(series):
+    """Dense integer ids of an interned column; -1 for missing values."""
+    return series.cat.codes.to_numpy()
+
+# Tables that change during the Games. A refresh diffs their lines against the previous
+# read and parses only the new or edited ones; other tables are reused when unchanged.
+INCREMENTAL_TABLES = ('medals', 'medallists', 'medals_total', 'schedules')
+
+class TableSource(NamedTuple):
+    """What a table was read from: file size and mtime, plus its header and line keys for diffing."""
+    size: object
+    mtime: object
+    header: object = None
+    keys: object = None
+
+class TableUpdate(NamedTuple):
+    """A table's change since the previous generation.
+
+    ``order`` gives, for each row of the new table, its position in the previous one or -1
+    for a row parsed from ``added``; both are None when the file did not change. ``removed``
+    holds the positions of previous rows that are gone.
+    """
+    source: TableSource
+    order: object = None
+    added: object = None
+    removed: object = None
+
+def file_stat(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None, None
+
+def read_lines(path):
+    """Header line and non-empty data lines of a CSV file, as bytes."""
+    with open(path, 'rb') as f:
+        lines = f.read().split(b'\n')
+    return lines[0], [line for line in lines[1:] if line.strip()]
+
+def line_keys(lines):
+    """Identifies each line by its hash and how many identical lines precede it."""
+    hashes = pd.Series([hash(line) for line in lines], dtype='int64')
+    return pd.MultiIndex.from_arrays([hashes, hashes.groupby(hashes).cumcount()])
+
+def table_source(name, rows):
+    """TableSource of the file of ``name``; line keys only for INCREMENTAL_TABLES whose lines are rows."""
+    path = os.path.join(DATA_FOLDER, TABLES[name])
+    size, mtime = file_stat(path)
+    if name not in INCREMENTAL_TABLES or size is None:
+        return TableSource(size, mtime)
+    header, lines = read_lines(path)
+    if len(lines) != rows or file_stat(path) != (size, mtime):
+        # Quoted line breaks, or the file moved under us: fall back to full reads
+        return TableSource(size, mtime)
+    return TableSource(size, mtime, header, line_keys(lines))
+
+def value_dtype(series):
+    return series.cat.categories.dtype if series.dtype == 'category' else series.dtype
+
+def is_text(series):
+    dtype = value_dtype(series)
+    return pd.api.types.is_string_dtype(dtype) or dtype == object
+
+def is_numeric(series):
+    return pd.api.types.is_numeric_dtype(value_dtype(series))
+
+@generation_cache
+def table_update(name):
+    """How the file of table ``name`` changed since the previous generation read it.
+
+    None when there is nothing to diff against and the table has to be read in full.
+    """
+    previous = current_generation().previous
+    source = previous.sources.get(name) if previous else None
+    if source is None:
+        return None
+    path = os.path.join(DATA_FOLDER, TABLES[name])
+    size, mtime = file_stat(path)
+    if (size, mtime) == (source.size, source.mtime):
+        return TableUpdate(source)
+    if source.keys is None or size is None:
+        return None
+
+    header, lines = read_lines(path)
+    if header != source.header:
+        return None
+    keys = line_keys(lines)
+    order = source.keys.get_indexer(keys)
+    new_lines = [lines[i] for i in np.flatnonzero(order < 0)]
+    # A few lines can't show that a column is text (e.g. medals.code is mostly digits)
+    table = previous.peek(shared_table.__wrapped__, (name, None, False))
+    text = {column: str for column in table.columns if is_text(table[column])}
+    added = pd.read_csv(io.BytesIO(b'\n'.join([header] + new_lines)), dtype=text)
+    if len(added) and any(is_numeric(table[column]) and is_text(added[column])
+                          for column in added.columns if column in table):
+        # A new line turned a numeric column into text; a full read types the old rows to match
+        return None
+    added = apply_schema(name, added)
+    if len(added) != len(new_lines):
+        return None
+    removed = np.setdiff1d(np.arange(len(source.keys)), order[order >= 0])
+    return TableUpdate(TableSource(size, mtime, header, keys), order, added, removed)
+
+def previous_result(func, args, tables):
+    """What ``func(*args)`` returned in the previous generation, if none of ``tables`` changed since."""
+    previous = current_generation().previous
+    if previous is None:
+        return None
+    for name in tables:
+        update = table_update(name)
+        if update is None or update.order is not None:
+            return None
+    return previous.peek(func, args)
+
+def concat_categorical(frames):
+    """Concatenates frames whose category columns may hold different categories, keeping them categorical."""
+    first = frames[0]
+    frames = [frame.copy(deep=False) for frame in frames]
+    for column in first.columns:
+        if first[column].dtype != 'category':
+            continue
+        categories = first[column].cat.categories
+        for frame in frames[1:]:
+            if column in frame.columns:
+                other = pd.Index(frame[column].dropna().unique())
+                categories = categories.append(other.difference(categories))
+        for frame in frames:
+            if column in frame.columns:
+                frame[column] = pd.Categorical(frame[column], categories=categories)
+    return pd.concat(frames, ignore_index=True)
+
+def apply_update(name, previous, update):
+    """The new full table of ``name``: unchanged rows come from ``previous``, only ``update.added`` was parsed."""
+    if update.order is None:
+        return recategorize(name, previous)
+    added = intern_entities(name, update.added.copy(deep=False))
+    positions = update.order.copy()
+    new = positions < 0
+    positions[new] = len(previous) + np.arange(new.sum())
+    table = concat_categorical([recategorize(name, previous), added]).take(positions).reset_index(drop=True)
+    # Another table may have extended a vocabulary meanwhile; ids must follow its order
+    return recategorize(name, table)
+
+def table_changes(name):
+    """``(added, removed)`` rows of table ``name`` since the previous generation, or None if unknown."""
+    update = table_update(name)
+    if update is None:
+        return None
+    current = shared_table(name)
+    if update.order is None:
+        return current.iloc[:0], current.iloc[:0]
+    previous = current_generation().previous.peek(shared_table.__wrapped__, (name, None, False))
+    return current.iloc[np.flatnonzero(update.order < 0)], previous.take(update.removed)
+
+@generation_cache
+def shared_table(name, columns=None, processed=False):
+    """The one process-wide copy of a table, shared by every session; never modify it in place.
+
+    A column subset is projected from the full table when that is already loaded.
+    """
+    file = TABLES[name]
+    if not os.path.exists(os.path.join(DATA_FOLDER, file)):
+        if columns is None and not processed:
+            current_generation().sources[name] = TableSource(None, None)
+        return pd.DataFrame()
+
+    processor = PROCESSORS.get(name) if processed else None
+    if processor:
+        read_columns = columns
+        if columns is not None:
+            read_columns = tuple(columns) + tuple(c for c in processor[0] if c not in columns)
+        df = shared_table(name, read_columns)
+        return processor[1](df.copy(deep=False)) if not df.empty else df
+
+    generation = current_generation()
+    previous = generation.previous
+    previous_full = previous.peek(shared_table.__wrapped__, (name, None, False)) if previous else None
+    if columns is not None:
+        full = generation.peek(shared_table.__wrapped__, (name, None, False))
+        if full is not None or previous_full is not None:
+            return select_columns(shared_table(name), columns)
+
+    path = artifact_path('tables', name + '.parquet')
+    if path is not None:
+        df = read_parquet_columns(path, columns)
+        if columns is None:
+            generation.sources[name] = table_source(name, len(df))
+        # Integer categories do not survive Parquet; recoding onto the vocabularies restores them
+        return intern_entities(name, df)
+
+    if previous_full is not None:
+        update = table_update(name)
+        if update is not None:
+            generation.sources[name] = update.source
+            return apply_update(name, previous_full, update)
+
+    manifest = load_manifest()
+    try:
+        df = read_csv_cached(file, manifest, columns)
+    except Exception as e:
+        st.error(f"Error loading {file}: {e}")
+        return pd.DataFrame()
+    update_manifest(manifest, [file])
+    if columns is None:
+        generation.sources[name] = table_source(name, len(df))
+    return intern_entities(name, df)
+
+def load_table(name, columns=None, processed=False):
+    """Loads a single table from the data folder, optionally restricted to ``columns``.
+
+    The frame is a shallow copy of shared_table: its columns are the shared buffers, and
+    copy-on-write gives the caller a private copy of any column it modifies.
+    """
+    file = TABLES[name]
+    if not os.path.exists(os.path.join(DATA_FOLDER, file)):
+        st.warning(f"File {file} not found in {DATA_FOLDER}")
+        #empty dataframe to prevent crashes if file missing
+        return pd.DataFrame()
+    return shared_table(name, columns, processed).copy(deep=False)
+
+# List-encoded columns that are parsed once into bridge tables (see load_bridge)
+LIST_COLUMNS = {
+    'athletes': ['disciplines'],
+    'teams': ['athletes', 'athletes_codes', 'coaches_codes'],
+    'technical_officials': ['disciplines'],
+    'venues': ['sports'],
+}
+LIST_ITEM_PATTERN = r"'((?:[^'\\]|\\.)*)'|\"((?:[^\"\\]|\\.)*)\""
+
+def explode_list_column(series):
+    """Parses a column of list literals such as "['Judo', 'Wrestling']" in one vectorized pass.
+
+    Returns a long-form frame with one line per list item: ``row`` (the source index label)
+    and ``value``. Plain strings without brackets count as a one-item list.
+    """
+    text = series.dropna().astype(str)
+    is_list = text.str.startswith('[')
+
+    items = text[is_list].str.extractall(LIST_ITEM_PATTERN)
+    values = items[0].fillna(items[1]).str.replace(r"\\(.)", r"\1", regex=True).str.strip()
+    plain = text[~is_list].str.strip()
+    plain = plain[plain != '']
+
+    return pd.concat([
+        pd.DataFrame({'row': values.index.get_level_values(0), 'value': values.to_numpy()}),
+        pd.DataFrame({'row': plain.index, 'value': plain.to_numpy()}),
+    ], ignore_index=True).sort_values('row', kind='stable', ignore_index=True)
+
+@generation_cache
+def shared_bridge(name, column):
+    """Builds the bridge table for a list-encoded column of ``name``, once per process.
+
+    One line per list item: ``row`` is the index label of the source row and ``column``
+    holds the item, as int32 for ``*_codes`` columns and as a category otherwise.
+    """
+    path = artifact_path('bridges', f'{name}.{column}.parquet')
+    if path is not None:
+        return pd.read_parquet(path)
+    bridge = previous_result(shared_bridge.__wrapped__, (name, column), (name,))
+    if bridge is not None:
+        return bridge
+    df = load_table(name, (column,))
+    if column not in df.columns:
+        return pd.DataFrame({'row': pd.Series(dtype='int32'), column: pd.Series(dtype='category')})
+
+    with span('parse_lists', table=name, column=column):
+        bridge = explode_list_column(df[column])
+    bridge['row'] = bridge['row'].astype('int32')
+    if column.endswith('_codes'):
+        codes = pd.to_numeric(bridge['value'], errors='coerce')
+        bridge = bridge[codes.notna()]
+        bridge['value'] = codes[codes.notna()].astype('int32')
+    else:
+        bridge['value'] = bridge['value'].astype('category')
+    entity = ENTITY_COLUMNS.get(name, {}).get(column)
+    if entity is not None:
+        entity_vocabulary(entity, entity_keys(bridge['value']))
+    return bridge.rename(columns={'value': column}).reset_index(drop=True)
+
+def load_bridge(name, column):
+    """Returns the bridge table for a list-encoded column of ``name`` as a shallow copy (see shared_bridge)."""
+    return shared_bridge(name, column).copy(deep=False)
+
+def rows_with_any(name, column, values):
+    """Index labels of ``name`` rows whose list-encoded ``column`` contains any of ``values``."""
+    bridge = load_bridge(name, column)
+    return bridge.loc[bridge[column].isin(values), 'row'].unique()
+
+# Threads that load tables concurrently; pyarrow's CSV and Parquet readers release the GIL
+LOAD_WORKERS = int(os.environ.get('LOAD_WORKERS', min(8, os.cpu_count() or 1)))
+
+def preload_tables(columns, processed=False, workers=None):
+    """Fills shared_table for several tables at once on a bounded thread pool.
+
+    ``columns`` maps each table name to the columns needed, or None for all of them, as in
+    load_data. Tables already loaded or missing on disk are skipped. The workers run with
+    the caller's script run context attached, so read errors still show on its page.
+    Returns the seconds each table took to read.
+    """
+    generation = current_generation()
+    pending = [(name, tuple(cols) if cols is not None else None) for name, cols in columns.items()
+               if os.path.exists(os.path.join(DATA_FOLDER, TABLES[name]))]
+    pending = [(name, cols) for name, cols in pending
+               if generation.peek(shared_table.__wrapped__, (name, cols, processed)) is None]
+
+    def read(table):
+        start = time.perf_counter()
+        shared_table(table[0], table[1], processed)
+        return table[0], time.perf_counter() - start
+
+    if len(pending) < 2:
+        return dict(map(read, pending))
+    ctx = get_script_run_ctx(suppress_warning=True)
+    # Loaders find the generation being built through a thread-local, so hand that on too
+    building = getattr(_local, 'generation', None)
+
+    def attach():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        _local.generation = building
+
+    with ThreadPoolExecutor(min(workers or LOAD_WORKERS, len(pending)), initializer=attach) as pool:
+        return dict(pool.map(read, pending))
+
+def load_tables(columns, processed=False):
+    """Loads several tables concurrently (see preload_tables); returns ``{name: DataFrame}`` like load_table."""
+    preload_tables(columns, processed)
+    return {name: load_table(name, tuple(cols) if cols is not None else None, processed)
+            for name, cols in columns.items()}
+
+class Dataset(Mapping):
+    """Read-only mapping of table name to DataFrame that loads each table on first access.
+
+    ``columns`` maps a table name to the columns a page needs from it; tables not listed
+    are read in full.
+    """
+
+    def __init__(self, columns=None, processed=False):
+        self.columns = columns or {}
+        self.processed = processed
+        self._tables = {}
+
+    def __getitem__(self, name):
+        if name not in TABLES:
+            raise KeyError(name)
+        if name not in self._tables:
+            columns = self.columns.get(name)
+            with span('process_data' if self.processed else 'load_data', table=name):
+                self._tables[name] = load_table(name, tuple(columns) if columns is not None else None,
+                                                self.processed)
+        return self._tables[name]
+
+    def __contains__(self, name):
+        return name in TABLES
+
+    def load(self, names=None):
+        """Loads ``names`` (default: the tables declared in ``columns``) concurrently; returns self."""
+        names = [name for name in (names or self.columns) if name not in self._tables]
+        with span('process_data' if self.processed else 'load_data', tables=names):
+            self._tables.update(load_tables({name: self.columns.get(name) for name in names}, self.processed))
+        return self
+
+    def __iter__(self):
+        return iter(TABLES)
+
+    def __len__(self):
+        return len(TABLES)
+
+def load_data(columns=None):
+    """Returns a lazy view over the datasets in the data folder.
+
+    Nothing is read until a table is first accessed; ``columns`` optionally declares,
+    per table, the only columns the caller needs.
+    """
+    return Dataset(columns)
 
-@st.cache_data
 def process_data(data):
-    """Pre-process data, e.g., adding continent information."""
+    """Pre-process data, e.g., adding continent information.
 
-    if 'nocs' in data and not data['nocs'].empty:
-        data['nocs']['Continent'] = data['nocs']['country'].apply(get_continent)
+    The tables declared in ``columns`` are loaded up front, concurrently (see load_tables);
+    any other table is still loaded on first access.
+    """
+    return Dataset(data.columns, processed=True).load()
 
-    return data
+class FilterSpec(NamedTuple):
+    """Hashable sidebar selection; unpacks like the tuple sidebar_filters used to return."""
+    continents: tuple = ()
+    countries: tuple = ()
+    sports: tuple = ()
+    medal_types: tuple = ('Gold', 'Silver', 'Bronze')
 
 def sidebar_filters(data):
     """Creates global sidebar filters and returns selected values."""
-    st.sidebar.header("Global Filters")
+    with span('sidebar_filters'):
+        st.sidebar.header("Global Filters")
     
-    selected_continent = []
-    selected_country = []
-    selected_sport = []
-    selected_medal_type = []
-
-    # Continent Filter
-    if 'nocs' in data and not data['nocs'].empty and 'Continent' in data['nocs'].columns:
-        continents = sorted(data['nocs']['Continent'].dropna().unique())
-        selected_continent = st.sidebar.multiselect("Select Continent", continents)
-
-    # Country Filter
-    if 'nocs' in data and not data['nocs'].empty:
-        df_countries = data['nocs']
-        if selected_continent:
-            df_countries = df_countries[df_countries['Continent'].isin(selected_continent)]
+        selected_continent = []
+        selected_country = []
+        selected_sport = []
+        selected_medal_type = []
+
+        # Continent Filter
+        if 'nocs' in data and not data['nocs'].empty and 'Continent' in data['nocs'].columns:
+            continents = sorted(data['nocs']['Continent'].dropna().unique())
+            selected_continent = st.sidebar.multiselect("Select Continent", continents)
+
+        # Country Filter
+        if 'nocs' in data and not data['nocs'].empty:
+            df_countries = data['nocs']
+            if selected_continent:
+                df_countries = df_countries[df_countries['Continent'].isin(selected_continent)]
             
-        countries = sorted(df_countries['country'].unique()) if 'country' in df_countries.columns else []
-        selected_country = st.sidebar.multiselect("Select Country (NOC)", countries)
+            countries = sorted(df_countries['country'].unique()) if 'country' in df_countries.columns else []
+            selected_country = st.sidebar.multiselect("Select Country (NOC)", countries)
     
-    # Sport Filter
-    if 'events' in data and not data['events'].empty:
-        sports = sorted(data['events']['sport'].unique()) if 'sport' in data['events'].columns else []
-        selected_sport = st.sidebar.multiselect("Select Sport", sports)
-
-    # Medal Type Filter
-    medal_types = ['Gold', 'Silver', 'Bronze']
-    selected_medal_type = []
-    st.sidebar.write("Select Medal Type")
-    for medal in medal_types:
-        if st.sidebar.checkbox(medal, value=True):
-            selected_medal_type.append(medal)
+        # Sport Filter
+        if 'events' in data and not data['events'].empty:
+            sports = sorted(data['events']['sport'].unique()) if 'sport' in data['events'].columns else []
+            selected_sport = st.sidebar.multiselect("Select Sport", sports)
+
+        # Medal Type Filter
+        medal_types = ['Gold', 'Silver', 'Bronze']
+        selected_medal_type = []
+        st.sidebar.write("Select Medal Type")
+        for medal in medal_types:
+            if st.sidebar.checkbox(medal, value=True):
+                selected_medal_type.append(medal)
             
-    return selected_continent, selected_country, selected_sport, selected_medal_type
+        return FilterSpec(tuple(selected_continent), tuple(selected_country),
+                          tuple(selected_sport), tuple(selected_medal_type))
+
+MEDAL_COLUMNS = {'Gold': 'Gold Medal', 'Silver': 'Silver Medal', 'Bronze': 'Bronze Medal'}
+
+# Table -> filter dimension -> column it filters on. Columns listed in LIST_COLUMNS
+# are matched through their bridge table.
+FILTER_COLUMNS = {
+    'athletes': {'country': 'country', 'sport': 'disciplines'},
+    'events': {'sport': 'sport'},
+    'medallists': {'country': 'country', 'sport': 'discipline', 'medal_type': 'medal_type'},
+    'medals': {'country': 'country', 'sport': 'discipline', 'medal_type': 'medal_type'},
+    'medals_total': {'country': 'country'},
+    'nocs': {'country': 'country'},
+    'schedules': {'sport': 'discipline'},
+}
+
+@generation_cache(max_entries=64)
+def countries_in_continents(continents):
+    nocs = load_table('nocs', ('code', 'country'), processed=True)
+    return tuple(nocs.loc[nocs['Continent'].isin(continents), 'country'].unique())
+
+def effective_countries(spec):
+    """Countries selected directly, or else every country of the selected continents."""
+    if spec.countries:
+        return spec.countries
+    if spec.continents:
+        return countries_in_continents(spec.continents)
+    return ()
+
+@generation_cache(max_entries=256)
+def dimension_mask(name, column, values):
+    """Read-only boolean mask of the rows of ``name`` whose ``column`` is in ``values``."""
+    if column in LIST_COLUMNS.get(name, []):
+        index = load_table(name, (column,)).index
+        mask = index.isin(rows_with_any(name, column, values))
+    else:
+        df = load_table(name, (column,))
+        if column not in df.columns:
+            mask = np.ones(len(df), dtype=bool)
+        elif df[column].dtype == 'category':
+            # Compare category codes rather than the labels themselves
+            wanted = df[column].cat.categories.get_indexer(pd.Index(values).unique())
+            mask = np.isin(df[column].cat.codes.to_numpy(), wanted[wanted >= 0])
+        else:
+            mask = df[column].isin(values).to_numpy()
+    mask.flags.writeable = False
+    return mask
+
+def filter_mask(name, spec, dimensions=('country', 'sport', 'medal_type')):
+    """Boolean row mask of table ``name`` under ``spec``, restricted to ``dimensions``.
+
+    Empty country and sport selections mean "no filter"; the medal type filter always
+    applies. Masks are memoized per (table, column, values), so every chart on every
+    page shares them. Returns None when nothing filters the table.
+    """
+    columns = FILTER_COLUMNS.get(name, {})
+    selections = {
+        'country': effective_countries(spec),
+        'sport': spec.sports,
+        'medal_type': tuple(MEDAL_COLUMNS[m] for m in spec.medal_types if m in MEDAL_COLUMNS),
+    }
+
+    mask = None
+    for dimension in dimensions:
+        if dimension not in columns or (dimension != 'medal_type' and not selections[dimension]):
+            continue
+        dim_mask = dimension_mask(name, columns[dimension], selections[dimension])
+        mask = dim_mask if mask is None else mask & dim_mask
+    return mask
+
+def filter_table(df, name, spec, dimensions=('country', 'sport', 'medal_type')):
+    """Applies the sidebar filters to ``df``, a frame freshly loaded from table ``name``.
+
+    The mask is looked up in the current generation, so ``df`` must come from the same one;
+    pages pin theirs (see pin_generation).
+    """
+    with span('filter', table=name):
+        mask = filter_mask(name, spec, dimensions)
+        if mask is None or df.empty:
+            return df
+        return df[mask]
 
 
 
@@ -0,0 +1,105 @@
+import streamlit as st
+import logging
+import threading
+import time
+
+from utils import (DATA_FOLDER, TABLES, LIST_COLUMNS, LOAD_WORKERS, preload_tables, shared_bridge, load_noc_dimension,
+                   artifact_folder, data_version, active_generation, build_generation, publish_generation)
+from cube import load_medal_cube
+from schedule import load_schedule, load_session_index
+from search import load_athlete_search_index
+from graph import load_relation_graph
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of data/ for changes
+REFRESH_INTERVAL = 30
+
+
+def warm_up():
+    """Builds every table and derived structure the pages use, in the current generation.
+
+    Full tables are loaded first, concurrently, so the column subsets pages ask for are
+    projected from them instead of read again.
+    """
+    start = time.perf_counter()
+    timings = preload_tables(dict.fromkeys(TABLES))
+    if timings:
+        slowest = max(timings, key=timings.get)
+        logger.info("Loaded %d tables in %.2fs on up to %d threads (%.2fs summed; slowest %s, %.2fs)",
+                    len(timings), time.perf_counter() - start, LOAD_WORKERS, sum(timings.values()),
+                    slowest, timings[slowest])
+    for name, columns in LIST_COLUMNS.items():
+        for column in columns:
+            shared_bridge(name, column)
+    load_noc_dimension()
+    load_medal_cube()
+    load_schedule()
+    load_session_index()
+    load_athlete_search_index()
+    load_relation_graph()
+
+
+def refresh(version):
+    """Rebuilds everything cached in the active generation from the data on disk, then swaps it in.
+
+    The new generation replays every call the active one has served, off the request path;
+    sessions keep reading the old one until the swap.
+    """
+    generation = build_generation(version, active_generation().requests())
+    publish_generation(generation)
+    logger.info("Data refreshed to version %s", version)
+
+
+class Refresher(threading.Thread):
+    """Warms the caches, then refreshes them whenever data/ changes.
+
+    A change is only picked up once the data version is the same on two consecutive checks,
+    so files still being written are not loaded half-way.
+    """
+
+    def __init__(self, interval=REFRESH_INTERVAL):
+        super().__init__(name='data-refresher', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            warm_up()
+        except Exception:
+            logger.exception("Warm-up failed")
+
+        pending = None
+        while not self.stopped.wait(self.interval):
+            version = data_version()
+            if version == active_generation().version:
+                pending = None
+            elif version != pending:
+                pending = version
+            else:
+                try:
+                    refresh(version)
+                except Exception:
+                    logger.exception("Data refresh failed; keeping version %s", active_generation().version)
+                pending = None
+
+
+@st.cache_resource
+def start_background_refresh():
+    """Starts the warm-up and refresh thread, once per process.
+
+    Streamlit has no server-start hook, so this runs on the first session's rerun; the
+    prebuilt artifacts (``python build.py``) keep that first warm-up short.
+    """
+    if artifact_folder() is None:
+        logger.warning("No prebuilt artifacts for the data in %s; the first sessions wait while the warm-up "
+                       "derives everything from the CSVs. Run `python build.py` when deploying.", DATA_FOLDER)
+    refresher = Refresher()
+    refresher.start()
+    return refresher
+
+
+if __name__ == '__main__':
+    # Times a cold warm-up; only the Parquet cache and NOC dimension outlive it (build.py keeps everything)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    warm_up()